@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: bench_concurrency.py
+# @Created: 2026-10-18 09:48:05
+# @Modified: 2026-10-18 03:55:09
+
+"""对比阻塞请求与 `SessionPool.arequest` 在协程中的总耗时
+
+在本地启动一个按 `delay` 参数延迟响应的 HTTP 服务，模拟简书、博客园、思否三个平台和 N 张图片的请求，在仓库根目录执行：
+
+    python -m benchmarks.bench_concurrency --images 10
+
+阻塞请求的总耗时约等于各请求延迟之和，异步请求的总耗时约等于最大延迟。
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from mbs.utils.session import SessionPool
+
+
+class DelayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        delay = float(parse_qs(urlsplit(self.path).query).get("delay", ["0"])[0])
+        time.sleep(delay)
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+async def blocking(pool: SessionPool, urls):
+    async def fetch(url):
+        return pool.request("GET", url)
+
+    await asyncio.gather(*[fetch(url) for url in urls])
+
+
+async def non_blocking(pool: SessionPool, urls):
+    await asyncio.gather(*[pool.arequest("GET", url) for url in urls])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=10, help="模拟的图片数量")
+    parser.add_argument("--image-delay", type=float, default=0.1, help="每张图片的响应延迟（秒）")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DelayHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    delays = [0.3, 0.2, 0.25] + [args.image_delay] * args.images
+    urls = [f"{base}/?delay={d}&n={i}" for i, d in enumerate(delays)]
+
+    pool = SessionPool(max_workers=len(urls))
+    print(f"请求数：{len(urls)}，延迟之和：{sum(delays):.2f}s，最大延迟：{max(delays):.2f}s")
+
+    for name, func in (("blocking", blocking), ("arequest", non_blocking)):
+        start = time.perf_counter()
+        asyncio.run(func(pool, urls))
+        print(f"{name:>9}: {time.perf_counter() - start:.2f}s")
+
+    pool.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: bench_hash.py
+# @Created: 2026-10-18 11:08:40
+# @Modified: 2026-10-18 03:55:10
+
+"""对比逐块单线程计算 md5、各指纹算法，以及 `hash_files` 在不同线程数下的耗时
+
+在临时目录中生成 N 篇文章后，先用 4096 字节逐块读取的单线程方式计算 md5，
+再用单线程分别计算各指纹算法（md5、blake2b，安装了 xxhash 时还有 xxh3），
+最后用 1、2、4 … 个线程的 `hash_files` 以默认算法计算所有文件的指纹，在仓库根目录执行：
+
+    python -m benchmarks.bench_hash --files 2000 --size 262144
+
+hashlib 计算时会释放 GIL，耗时应随线程数（不超过 CPU 核数）近似线性下降。
+"""
+
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+
+from mbs.utils.hashing import available_algorithms, hash_file, hash_files, scan_markdown_files
+
+
+def chunked_md5(file_path: str, buf: int = 4096) -> str:
+    md5 = hashlib.md5()
+    with open(file_path, "rb") as fb:
+        while True:
+            data = fb.read(buf)
+            if not data:
+                break
+            md5.update(data)
+    return md5.hexdigest()
+
+
+def make_corpus(root: str, files: int, size: int, folders: int = 20):
+    for i in range(files):
+        folder = os.path.join(root, f"category-{i % folders}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"post-{i}.md"), "wb") as f:
+            f.write(os.urandom(size))
+
+
+def timeit(name: str, func) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>12}: {elapsed:.3f}s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=2000, help="文章数量")
+    parser.add_argument("--size", type=int, default=256 * 1024, help="每篇文章的字节数")
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as root:
+        make_corpus(root, args.files, args.size)
+        paths = [path for group in scan_markdown_files(root).values() for path in group]
+        print(f"文章数：{len(paths)}，每篇 {args.size} 字节，CPU 核数：{cpus}")
+
+        baseline = timeit("4 KB chunks", lambda: [chunked_md5(path) for path in paths])
+        for algorithm in available_algorithms():
+            timeit(algorithm, lambda: [hash_file(path, algorithm=algorithm) for path in paths])
+        workers = 1
+        while workers <= cpus:
+            elapsed = timeit(f"{workers} threads", lambda: hash_files(paths, workers=workers))
+            print(f"{'':>12}  {baseline / elapsed:.2f}x")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: bench_images.py
+# @Created: 2026-10-18 13:46:31
+# @Modified: 2026-10-18 03:55:10
+
+"""对比逐张图片 `str.replace` 与 `replace_images` 一次遍历替换图片链接的耗时
+
+生成包含 N 张图片（默认 200、1000、5000 张）的文章，每两张图片之间有一段正文，在仓库根目录执行：
+
+    python -m benchmarks.bench_images --images 200 1000 5000 --repeat 5
+
+逐张替换每次都复制整篇文章，并且要在已替换的链接列表中线性查找，耗时随图片数平方增长。
+"""
+
+import argparse
+import time
+
+from typing import Dict, List, Tuple
+
+from mbs.utils.images import find_images, replace_images
+
+PARAGRAPH = "这是一段用来填充文章的正文，长度和普通的技术文章差不多。" * 8
+
+
+def make_post(images: int) -> Tuple[str, Dict[str, str]]:
+    lines = []
+    urls = {}
+    for i in range(images):
+        raw = f"https://example.com/images/{i}.png"
+        lines.append(f"{PARAGRAPH}\n\n![图{i}]({raw})\n")
+        urls[raw] = f"https://upload-images.jianshu.io/upload_images/{i}.png"
+    return "\n".join(lines), urls
+
+
+def replace_one_by_one(content: str, urls: Dict[str, str]) -> str:
+    # 原来的实现：图片 × 已上传链接的二重循环，每张图片调用一次 content.replace
+    imgs = list(set(find_images(content)))
+    new_imgs = set(urls.items())
+    for img in imgs:
+        for new_img in new_imgs:
+            if new_img[0] == img:
+                content = content.replace(img, new_img[1])
+                new_imgs.remove(new_img)
+                break
+    return content
+
+
+def best_of(repeat: int, func) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, nargs="+", default=[200, 1000, 5000], help="每篇文章的图片数")
+    parser.add_argument("--repeat", type=int, default=5, help="每种实现的执行次数，取最快的一次")
+    args = parser.parse_args()
+
+    for images in args.images:
+        content, urls = make_post(images)
+        # 链接互不包含时两种实现的结果相同
+        assert replace_one_by_one(content, urls) == replace_images(content, urls)
+
+        old = best_of(args.repeat, lambda: replace_one_by_one(content, urls))
+        new = best_of(args.repeat, lambda: replace_images(content, urls))
+        print(
+            f"{images:>6} 张图片，{len(content) / 1024:>8.1f} KiB：逐张替换 {old * 1000:>9.2f} ms，"
+            f"一次遍历 {new * 1000:>7.2f} ms，{old / new:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
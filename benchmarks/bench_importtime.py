@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: bench_importtime.py
+# @Created: 2026-10-18 12:52:10
+# @Modified: 2026-10-18 12:52:10
+
+"""用 `python -X importtime` 统计 `mbs -v` 和 `mbs -sc` 启动时的导入耗时
+
+每条命令在临时的配置目录中执行 N 次，取导入耗时的中位数，并列出耗时最多的模块：
+
+    python benchmarks/bench_importtime.py --runs 10
+
+不需要的重量级依赖（requests、xmlrpc、paramiko、psycopg2 等）被导入时打印出来并返回非零退出码，
+可以放在 CI 中防止启动耗时回退。
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from typing import Dict, List, Tuple
+
+# 命令 => 执行时不应导入的模块
+COMMANDS: Dict[str, Tuple[List[str], List[str]]] = {
+    "mbs -v": (
+        ["-v"],
+        ["requests", "xmlrpc.client", "colort", "colorful_logger", "mbs.manager", "mbs.blogs", "paramiko", "psycopg2"],
+    ),
+    "mbs -sc": (
+        ["-sc"],
+        ["requests", "xmlrpc.client", "mbs.blogs", "paramiko", "psycopg2"],
+    ),
+}
+
+
+def import_times(argv: List[str], home: str) -> Tuple[int, Dict[str, int]]:
+    """执行一次命令
+
+    Returns:
+        Tuple[int, Dict[str, int]]: 解释器启动（site）之后所有导入的总耗时和各模块的累计耗时，单位为微秒
+    """
+    env = dict(os.environ, HOME=home, APPDATA=home)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "mbs", *argv],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+    total = 0
+    modules: Dict[str, int] = {}
+    after_site = False
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        module = name.strip()
+        # 解释器启动时的导入以顶层的 site 结束，顶层的导入名前只有一个空格
+        if not after_site:
+            after_site = module == "site" and not name.startswith("  ")
+            continue
+        modules[module] = int(cumulative)
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10, help="每条命令的执行次数")
+    parser.add_argument("--top", type=int, default=10, help="列出耗时最多的模块数")
+    args = parser.parse_args()
+
+    code = 0
+    with tempfile.TemporaryDirectory() as home:
+        for command, (argv, forbidden) in COMMANDS.items():
+            totals = []
+            modules: Dict[str, int] = {}
+            for _ in range(args.runs):
+                total, modules = import_times(argv, home)
+                totals.append(total)
+
+            print(f"{command}: {statistics.median(totals) / 1000:.1f} ms（{args.runs} 次的中位数）")
+            for module, cumulative in sorted(modules.items(), key=lambda i: -i[1])[: args.top]:
+                print(f"{'':>4}{cumulative / 1000:>8.1f} ms  {module}")
+
+            loaded = [module for module in forbidden if module in modules]
+            if loaded:
+                print(f"{'':>4}不应导入：{', '.join(loaded)}")
+                code = 1
+            print()
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
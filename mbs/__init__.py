@@ -4,20 +4,22 @@
 # @Email: thepoy@163.com
 # @File Name: __init__.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-10-14 11:34:10
+# @Modified: 2026-10-18 03:52:51
 
+import io
+import os
 import json
 import sys
-import asyncio
 import argparse
-from typing import Any, Dict
+from contextlib import redirect_stderr, redirect_stdout
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-from colort import display_style as ds
-
-from mbs.utils.common import read_post_from_file, get_md5_of_file
-from mbs.manager import AllBlogsManager
+from mbs.utils.settings import CONFIG_FILE_PATH
 from mbs.utils.logger import logger, child_logger
-from mbs.utils.settings import CONFIG_FILE_PATH, STATUS
+
+# `mbs -v`、`mbs -h` 只需要 argparse，其他依赖在执行对应命令时才导入
+if TYPE_CHECKING:
+    from mbs.manager import AllBlogsManager
 
 main_logger = child_logger(__name__)
 
@@ -57,11 +59,22 @@ def _build_parser():
     parser.add_argument("-sc", "--scan-updated-files", help="扫描所有需要更新的文档", action="store_true")
     parser.add_argument("-uo", "--update-one", metavar="PATH", help="更新一个文件", type=str)
     parser.add_argument("-ua", "--update-all", help="更新指定目录中的所有文件", action="store_true")
+    parser.add_argument(
+        "-w", "--watch", metavar="FOLDER", help="监听目录，文章保存后自动上传或更新，Ctrl+C 退出", type=str
+    )
+    parser.add_argument("--serve", help="启动后台服务，之后的命令交给后台服务执行，Ctrl+C 退出", action="store_true")
+    parser.add_argument("--local", help="不使用后台服务，在当前进程中执行命令", action="store_true")
     parser.add_argument("--update-jianshu-cookies", help="更新简书 cookies", action="store_true")
+    parser.add_argument(
+        "--deadline", metavar="SECONDS", help="上传或更新命令的最长执行时间，超时后取消未完成的任务", type=float
+    )
     return parser
 
 
 def print_updated_result(files):
+    from colort import display_style as ds
+    from mbs.utils.settings import STATUS
+
     print()
     print(f"文章三种状态：{STATUS[1]} - 最新版，{STATUS[0]} - 未上传，{STATUS[2]} - 待更新")
 
@@ -128,100 +141,194 @@ def print_updated_result(files):
     print(f'└{"─" * 6}┴{"─"*title_width}┴{"─"*6}┴{"─"*8}┴{"─"*6}┴{"─"*(path_width)}┘')
 
 
-def main() -> int:
-    parser = _build_parser()
-    args = parser.parse_args()
+def _execute(args: argparse.Namespace, manager: Optional["AllBlogsManager"] = None) -> int:
+    import asyncio
 
-    with logger:
-        manager = AllBlogsManager()
-
-        if args.categories:
-            print("*" * 60)
-            for i in manager.db.get_categories():
-                print(i, end="\t")
-            print()
-            print("*" * 60)
-            return 0
+    from mbs.manager import AllBlogsManager
+    from mbs.utils.common import read_post_and_md5
+
+    manager = manager or AllBlogsManager()
 
-        if args.new_post:
+    if args.categories:
+        print("*" * 60)
+        for i in manager.db.get_categories():
+            print(i, end="\t")
+        print()
+        print("*" * 60)
+        return 0
+
+    if args.new_post:
+        manager.ensure_categories_synced()
+        categories = manager.db.get_categories()
+        category, file_path = args.new_post
+        if category not in categories:
+            # 分类可能是上次同步之后在平台中新建的
+            manager.ensure_categories_synced(force=True)
             categories = manager.db.get_categories()
-            category, file_path = args.new_post
-            if category not in categories:
-                main_logger.error(f"输入的分类名 `{category}` 不存在，有效的所有分类：{categories}")
-                return 1
-            title, content = read_post_from_file(file_path)
+        if category not in categories:
+            main_logger.error(f"输入的分类名 `{category}` 不存在，有效的所有分类：{categories}")
+            return 1
+        title, content, md5 = read_post_and_md5(file_path)
 
-            md5 = get_md5_of_file(file_path)
+        asyncio.run(
+            manager.run_with_deadline(manager.new_post(category, title, content, md5, file_path), args.deadline)
+        )
 
-            asyncio.run(manager.new_post(category, title, content, md5, file_path))
+        # site = Site()
+        # site.new_post(file_path)
 
-            # site = Site()
-            # site.new_post(file_path)
+        return 1 if manager.deadline_exceeded else 0
 
-            return 0
+    if args.delete:
+        title = args.delete
+        manager.delete_post(title)
+        return 0
+
+    if args.scan_updated_files:
+        # 未上传的文章
+        not_uploaded_posts = manager.find_all_not_uploaded_posts()
+        if not not_uploaded_posts:
+            main_logger.debug("没有上传失败的文章")
+
+        # 待更新的文章
+        changed_files = manager.find_all_changed_markdown_files()
+        if not changed_files:
+            main_logger.debug("没有已修改的文章")
+
+        if not changed_files and not not_uploaded_posts:
+            from colort import display_style as ds
 
-        if args.delete:
-            title = args.delete
-            manager.delete_post(title)
+            print(f'┌{"─"*24}┐')
+            print("│  %s  │" % ds.format_with_one_style("所有文章都已是最新版", ds.foreground_color.green))
+            print(f'└{"─"*24}┘')
             return 0
 
-        if args.scan_updated_files:
-            # 未上传的文章
-            not_uploaded_posts = manager.find_all_not_uploaded_posts()
-            if not not_uploaded_posts:
-                main_logger.debug("没有上传失败的文章")
+        files = _merge_scan_result(not_uploaded_posts, changed_files)
 
-            # 待更新的文章
-            changed_files = manager.find_all_changed_markdown_files()
-            if not changed_files:
-                main_logger.debug("没有已修改的文章")
+        print_updated_result(files)
 
-            if not changed_files and not not_uploaded_posts:
-                print(f'┌{"─"*24}┐')
-                print("│  %s  │" % ds.format_with_one_style("所有文章都已是最新版", ds.foreground_color.green))
-                print(f'└{"─"*24}┘')
-                return 0
+        return 0
 
-            files = _merge_scan_result(not_uploaded_posts, changed_files)
+    if args.update_one:
+        # TODO: 更新一篇文章，如果某网站没有上传，先上传此网站，再更新其他网站
+        title, content, md5 = read_post_and_md5(args.update_one)
+        asyncio.run(manager.run_with_deadline(manager.update_post(title, content, md5), args.deadline))
 
-            print_updated_result(files)
+        # site = Site()
+        # site.new_post(args.update_one)
 
-            return 0
+        return 1 if manager.deadline_exceeded else 0
 
-        if args.update_one:
-            # TODO: 更新一篇文章，如果某网站没有上传，先上传此网站，再更新其他网站
-            title, content = read_post_from_file(args.update_one)
-            md5 = get_md5_of_file(args.update_one)
-            asyncio.run(manager.update_post(title, content, md5))
+    if args.update_all:
+        changed_files = asyncio.run(manager.run_with_deadline(manager.update_all_posts(), args.deadline))
 
-            # site = Site()
-            # site.new_post(args.update_one)
+        # if changed_files:
+        #     site = Site()
+        #     for path in changed_files:
+        #         site.new_post(path)
 
-            return 0
+        return 1 if manager.deadline_exceeded else 0
 
-        if args.update_all:
-            changed_files = asyncio.run(manager.update_all_posts())
+    if args.watch:
+        try:
+            asyncio.run(manager.watch(args.watch))
+        except KeyboardInterrupt:
+            main_logger.info("已停止监听")
+        return 0
 
-            # if changed_files:
-            #     site = Site()
-            #     for path in changed_files:
-            #         site.new_post(path)
+    if args.update_jianshu_cookies:
+        cookies = input("请输入 cookies:")
 
-            return 0
+        cookies = {i.split("=")[0]: i.split("=")[1] for i in cookies.split("; ")}
+
+        with open(CONFIG_FILE_PATH, "r+") as f:
+            all_config: Dict[str, Any] = json.loads(f.read())
+            all_config["jianshu"]["cookies"] = cookies
+            f.seek(0, 0)
+            f.write(json.dumps(all_config))
+            f.truncate()
+
+    return 1
+
+
+def _delegable(args: argparse.Namespace) -> bool:
+    # 需要在终端交互或长期运行的命令只在当前进程中执行
+    return not (args.local or args.serve or args.watch or args.update_jianshu_cookies)
+
+
+def _serve() -> int:
+    from mbs import daemon
+    from mbs.manager import AllBlogsManager
 
-        if args.update_jianshu_cookies:
-            cookies = input("请输入 cookies:")
+    from mbs.utils.exceptions import AuthInfoRequiredError
+    from mbs.utils.logger import capture as capture_logs
+
+    parser = _build_parser()
+    manager = AllBlogsManager(interactive=False)
+    # 后台服务没有终端，读取输入时立即得到 EOFError，而不是一直等待
+    sys.stdin = io.StringIO()
+
+    def run(argv: List[str], cwd: str) -> Tuple[int, str]:
+        output = io.StringIO()
+        with redirect_stdout(output), redirect_stderr(output), capture_logs(output):
+            try:
+                args = parser.parse_args(argv)
+                if not _delegable(args):
+                    print("此命令不能在后台服务中执行，请加上 --local")
+                    return 1, output.getvalue()
+                os.chdir(cwd)
+                code = _execute(args, manager)
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except (AuthInfoRequiredError, EOFError) as e:
+                reason = str(e) if isinstance(e, AuthInfoRequiredError) else "需要在终端输入认证信息"
+                print(
+                    f"{reason}，后台服务不能交互：请加上 --local 执行，简书 cookies 过期时执行 mbs --update-jianshu-cookies"
+                )
+                code = 1
+            except Exception as e:
+                main_logger.error(f"命令执行失败：{e!r}")
+                code = 1
+        return code, output.getvalue()
+
+    return daemon.serve(run)
+
+
+def _report_sessions():
+    # 没有发送过网络请求时不必为了输出统计而导入 requests
+    session = sys.modules.get("mbs.utils.session")
+    if session is not None:
+        session.get_session_pool().report()  # type: ignore
+    httpcache = sys.modules.get("mbs.utils.httpcache")
+    if httpcache is not None:
+        httpcache.get_response_cache().report()  # type: ignore
 
-            cookies = {i.split("=")[0]: i.split("=")[1] for i in cookies.split("; ")}
 
-            with open(CONFIG_FILE_PATH, "r+") as f:
-                all_config: Dict[str, Any] = json.loads(f.read())
-                all_config["jianshu"]["cookies"] = cookies
-                f.seek(0, 0)
-                f.write(json.dumps(all_config))
-                f.truncate()
+def main() -> int:
+    parser = _build_parser()
+    args = parser.parse_args()
 
-        return 1
+    if args.serve:
+        with logger:
+            try:
+                return _serve()
+            finally:
+                _report_sessions()
+
+    if _delegable(args):
+        from mbs import daemon
+
+        result = daemon.request(sys.argv[1:])
+        if result is not None:
+            code, output = result
+            print(output, end="")
+            return code
+
+    with logger:
+        try:
+            return _execute(args)
+        finally:
+            _report_sessions()
 
 
 def run_main():
@@ -4,20 +4,20 @@
 # @Email: thepoy@163.com
 # @File Name: __init__.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-10-13 11:15:59
+# @Modified: 2026-10-18 03:22:29
 
 from abc import ABC, abstractmethod
 import json
 
-import requests
-
 from typing import Union, Optional, Dict
 
 from requests import Response
 
-from mbs.utils.settings import CONFIG_FILE_PATH
+from mbs.utils.settings import CONFIG_FILE_PATH, ensure_config_folder
 from mbs.utils.exceptions import ConfigFileNotFoundError
 from mbs.utils.logger import child_logger
+from mbs.utils.session import get_session_pool
+from mbs.utils.retry import request_with_retry
 
 PostID = Union[str, int]
 
@@ -73,27 +73,51 @@ class LoginedBaseBlog(ABC, BaseBlog):
                 f.write(json.dumps(all_config))
                 f.truncate()
         except FileNotFoundError:
+            ensure_config_folder()
             with open(CONFIG_FILE_PATH, "w") as f:
                 f.write(json.dumps({self.key: auth_dict}))
 
     def _get(self, url: str, headers: Optional[dict] = None) -> Response:
         if not headers:
             headers = self.headers
-        return requests.get(url, headers=headers)
+        return get_session_pool().request("GET", url, headers=headers)
 
     def _post(self, url: str, data: Optional[dict] = None, headers: Optional[dict] = None) -> Response:
         if not headers:
             headers = self.headers
         if data:
-            return requests.post(url, headers=headers, json=data)
+            return get_session_pool().request("POST", url, headers=headers, json=data)
         else:
-            return requests.post(url, headers=headers)
+            return get_session_pool().request("POST", url, headers=headers)
 
     def _put(self, url: str, data: Optional[dict], headers: Optional[dict] = None) -> Response:
         if not headers:
             headers = self.headers
 
-        return requests.put(url, headers=headers, json=data)
+        return get_session_pool().request("PUT", url, headers=headers, json=data)
+
+    async def _aget(self, url: str, headers: Optional[dict] = None) -> Response:
+        if not headers:
+            headers = self.headers
+        return await request_with_retry(self.key, "GET", url, headers=headers)  # type: ignore
+
+    async def _apost(
+        self, url: str, data: Optional[dict] = None, headers: Optional[dict] = None, idempotent: bool = False
+    ) -> Response:
+        if not headers:
+            headers = self.headers
+        if data:
+            return await request_with_retry(
+                self.key, "POST", url, idempotent=idempotent, headers=headers, json=data  # type: ignore
+            )
+        else:
+            return await request_with_retry(self.key, "POST", url, idempotent=idempotent, headers=headers)  # type: ignore
+
+    async def _aput(self, url: str, data: Optional[dict], headers: Optional[dict] = None) -> Response:
+        if not headers:
+            headers = self.headers
+
+        return await request_with_retry(self.key, "PUT", url, headers=headers, json=data)  # type: ignore
 
     @abstractmethod
     def get_post(self, postid: Union[str, int]) -> str:
@@ -4,108 +4,81 @@
 # @Email: thepoy@163.com
 # @File Name: cnblogs.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-06-19 23:06:29
+# @Modified: 2026-10-18 03:54:49
 
 import os
 import sys
 import json
+import asyncio
+import functools
 import mimetypes
+import http.client
 import xmlrpc.client as xml
 
 from xmlrpc.client import Fault
-from datetime import datetime
-from typing import Optional, List, Union, Any, Tuple
-
-from mbs.utils.structs.meta_weblog import BlogInfo, Post, Enclosure, Source, FileData, WpCategory
-from mbs.utils.settings import CONFIG_FILE_PATH
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, List, Union, Tuple
+
+from mbs.utils.structs.meta_weblog import BlogInfo, Post, FileData, WpCategory, create_post, remove_none
+from mbs.utils.settings import (
+    CONFIG_FILE_PATH,
+    ensure_config_folder,
+    CONNECT_TIMEOUT,
+    READ_TIMEOUT,
+    CNBLOGS,
+    HTTP_CACHE_TTLS,
+)
 from mbs.utils.logger import child_logger
+from mbs.utils.ratelimit import get_rate_limiter
+from mbs.utils.retry import call_with_retry
+from mbs.utils.httpcache import account_id, get_response_cache
 
 logger = child_logger(__name__)
 
 
-def remove_none(data: dict):
-    """去除值为 None 的元素
+class _TimeoutHTTPSConnection(http.client.HTTPSConnection):
+    """建立连接（包括 TLS 握手）时使用 `timeout`，连接建立后改为 `read_timeout`"""
 
-    Args:
-        data (dict): 要去除 None 的字典
-    """
-    for k, v in data.copy().items():
-        if not v:
-            del data[k]
-
-
-def create_post(
-    title: str,
-    description: str,
-    category: str,
-    enclosure: Optional[Enclosure] = None,
-    link: Optional[str] = None,
-    permalink: Optional[str] = None,
-    postid: Optional[Union[str, int]] = None,
-    source: Optional[Source] = None,
-    userid: Optional[str] = None,
-    mt_allow_comments: Optional[Any] = None,
-    mt_allow_pings: Optional[Any] = None,
-    mt_convert_breaks: Optional[Any] = None,
-    mt_text_more: Optional[str] = None,
-    mt_excerpt: Optional[str] = None,
-    mt_keywords: Optional[str] = None,
-    wp_slug: Optional[str] = None,
-) -> Post:
-    """创建 post 结构体/字典
-
-    Args:
-        title (str): 文章标题
-        description (str): 文章内容
-        category (Optional[List[str]], optional): 随笔分类
-        enclosure (Optional[Enclosure], optional): 不知道什么东西
-        link (Optional[str], optional): 不知道什么东西
-        permalink (Optional[str], optional): 不知道什么东西
-        postid (Optional[Union[str, int]], optional): 不知道什么东西
-        source (Optional[Source], optional): 不知道什么东西
-        userid (Optional[str], optional): 不知道什么东西
-        mt_allow_comments (Optional[Any], optional): 不知道什么东西
-        mt_allow_pings (Optional[Any], optional): 不知道什么东西
-        mt_convert_breaks (Optional[Any], optional): 不知道什么东西
-        mt_text_more (Optional[str], optional): 不知道什么东西
-        mt_excerpt (Optional[str], optional): 不知道什么东西
-        mt_keywords (Optional[str], optional): 不知道什么东西
-        wp_slug (Optional[str], optional): 不知道什么东西
-
-    Returns:
-        Post: 文章结构体
+    def __init__(self, *args, read_timeout: float = READ_TIMEOUT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_timeout = read_timeout
+
+    def connect(self):
+        super().connect()
+        self.sock.settimeout(self.read_timeout)
+
+
+class TimeoutSafeTransport(xml.SafeTransport):
+    """带超时的 xml-rpc https 传输层，同一个 host 的连接会被复用
+
+    与共享会话池一样，建立连接的超时较短，平台不可达时很快失败；读取响应的超时较长。
     """
 
-    categories = ["[Markdown]", f"[随笔分类]{category}"]
-    post = {
-        "dateCreated": datetime.now(),
-        "description": description,
-        "title": title,
-        "categories": categories,
-        "enclosure": enclosure,
-        "link": link,
-        "permalink": permalink,
-        "postid": postid,
-        "source": source,
-        "userid": userid,
-        "mt_allow_comments": mt_allow_comments,
-        "mt_allow_pings": mt_allow_pings,
-        "mt_convert_breaks": mt_convert_breaks,
-        "mt_text_more": mt_text_more,
-        "mt_excerpt": mt_excerpt,
-        "mt_keywords": mt_keywords,
-        "wp_slug": wp_slug,
-    }
-
-    remove_none(post)
-
-    return Post(post)
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        self._connection = host, _TimeoutHTTPSConnection(
+            chost,
+            None,
+            timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            context=self.context,
+            **(x509 or {}),
+        )
+        return self._connection[1]
 
 
 class CnblogsMetaWeblog:
     """博客园 api"""
 
-    key = "cnblogs"
+    key = CNBLOGS
 
     def __init__(self, blog_name: Optional[str] = None, username: Optional[str] = None, password: Optional[str] = None):
         """初始化函数
@@ -124,12 +97,12 @@ class CnblogsMetaWeblog:
             if not blog_name or not username or not password:
                 logger.fatal("config file is empty, you should input blogName, username, and password")
             else:
-                self._server = xml.ServerProxy("https://rpc.cnblogs.com/metaweblog/%s" % blog_name)
+                self._server = self._create_server(blog_name)
                 self._blogger = self._server.blogger
                 self.config = BlogInfo({"blogName": blog_name, "username": username, "password": password})
                 self._save_blog_config()
         else:
-            self._server = xml.ServerProxy("https://rpc.cnblogs.com/metaweblog/%s" % config["blogName"])
+            self._server = self._create_server(config["blogName"])
             self._blogger = self._server.blogger
             try:
                 config = BlogInfo(config)
@@ -140,6 +113,42 @@ class CnblogsMetaWeblog:
         self._meta_weblog = self._server.metaWeblog
         self._wp = self._server.wp
 
+        # ServerProxy 不是线程安全的，只用一个线程执行异步调用，
+        # xmlrpc 的 Transport 会在这个线程中一直复用同一个 HTTP/1.1 连接
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mbs-cnblogs")
+
+    def _create_server(self, blog_name: str) -> xml.ServerProxy:
+        return xml.ServerProxy("https://rpc.cnblogs.com/metaweblog/%s" % blog_name, transport=TimeoutSafeTransport())
+
+    def submit(self, func: Callable, *args) -> Future:
+        """在执行异步调用的同一个线程中执行同步方法，如 `get_categories`，避免与其他调用同时使用连接
+
+        Args:
+            func (Callable): 要执行的方法
+
+        Returns:
+            Future: 方法的返回值
+        """
+        return self._executor.submit(func, *args)
+
+    async def _call(self, method, *args, idempotent: bool = True):
+        """在专用线程中执行 xml-rpc 调用，不阻塞事件循环，失败时按策略重试
+
+        Args:
+            method (Callable): ServerProxy 上的远程方法，如 `self._meta_weblog.editPost`
+            idempotent (bool, optional): 调用是否幂等，非幂等的调用只在请求一定没有发出时重试
+
+        Returns:
+            Any: 远程方法的返回值
+        """
+
+        async def call():
+            await get_rate_limiter().acquire(self.key)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(method, *args))
+
+        return await call_with_retry(self.key, call, idempotent)
+
     def _get_users_blogs(self) -> Optional[dict]:
         """获取用户博客信息
 
@@ -186,6 +195,7 @@ class CnblogsMetaWeblog:
                         f.write(json.dumps(all_config))
                         f.truncate()
                 except FileNotFoundError:
+                    ensure_config_folder()
                     with open(CONFIG_FILE_PATH, "w") as f:
                         f.write(json.dumps({"cnblogs": self.config}))
                 logger.info("save blog info to file: %s" % CONFIG_FILE_PATH)
@@ -244,7 +254,9 @@ class CnblogsMetaWeblog:
         if isinstance(postid, int):
             postid = str(postid)
 
-        flag = self._meta_weblog.editPost(postid, self.config.username, self.config.password, dict(post), publish)
+        flag = await self._call(
+            self._meta_weblog.editPost, postid, self.config.username, self.config.password, dict(post), publish
+        )
         if flag:
             logger.info(f"{self}中已更新文章《{post.title}》")
         else:
@@ -252,20 +264,44 @@ class CnblogsMetaWeblog:
 
         return flag
 
-    def get_categories(self) -> List[dict]:
+    @property
+    def _account(self) -> str:
+        return account_id(self.config.blogName, self.config.username)
+
+    @property
+    def _categories_key(self) -> str:
+        # xml-rpc 的所有方法都使用同一个 URL，缓存键中加上方法名
+        return f"https://rpc.cnblogs.com/metaweblog/{self.config.blogName}#getCategories"
+
+    def get_categories(self, refresh: bool = False) -> List[dict]:
         """获取全部分类
 
+        xml-rpc 的响应没有 ETag，结果在 `HTTP_CACHE_TTLS["categories"]` 秒内直接使用缓存。
+
+        Args:
+            refresh (bool, optional): 是否丢弃缓存，重新获取分类列表
+
         Returns:
             list: 所有分类的详细信息
         """
-        resp_categories = self._meta_weblog.getCategories(
-            self.config.blogid, self.config.username, self.config.password
+        if refresh:
+            get_response_cache().invalidate(self.key, self._account, self._categories_key)
+
+        def load() -> List[dict]:
+            resp_categories = self._meta_weblog.getCategories(
+                self.config.blogid, self.config.username, self.config.password
+            )
+            categories = []
+            for category in resp_categories:  # type: ignore
+                if category["title"].startswith("[随笔分类]"):
+                    categories.append(
+                        {"id": category["categoryid"], "name": category["title"].replace("[随笔分类]", "")}
+                    )
+            return categories
+
+        return get_response_cache().memoize(
+            self.key, self._account, self._categories_key, HTTP_CACHE_TTLS["categories"], load
         )
-        categories = []
-        for category in resp_categories:  # type: ignore
-            if category["title"].startswith("[随笔分类]"):
-                categories.append({"id": category["categoryid"], "name": category["title"].replace("[随笔分类]", "")})
-        return categories
 
     def get_post(self, postid: Union[str, int]):
         """获取文章
@@ -324,7 +360,15 @@ class CnblogsMetaWeblog:
         """
         logger.debug(f"正在向分类 [ {post.categories} ] 中创建新文章 {post.title}")
         id_ = int(  # type: ignore
-            self._meta_weblog.newPost(self.config.blogid, self.config.username, self.config.password, dict(post), True)
+            await self._call(
+                self._meta_weblog.newPost,
+                self.config.blogid,
+                self.config.username,
+                self.config.password,
+                dict(post),
+                True,
+                idempotent=False,
+            )
         )
 
         logger.info(f"新文章《{post.title}》已上传到 {self}")
@@ -349,7 +393,10 @@ class CnblogsMetaWeblog:
         wp = {"name": name, "parent_id": parent_id, "slug": slug, "description": description}
         remove_none(wp)
         wp = WpCategory(wp)
-        return self._wp.newCategory(self.config.blogid, self.config.username, self.config.password, dict(wp))
+        try:
+            return self._wp.newCategory(self.config.blogid, self.config.username, self.config.password, dict(wp))
+        finally:
+            get_response_cache().invalidate(self.key, self._account, self._categories_key)
 
     def __str__(self):
         return "博客园"
@@ -4,26 +4,53 @@
 # @Email: thepoy@163.com
 # @File Name: jianshu.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-10-14 11:09:58
+# @Modified: 2026-10-18 03:54:19
 
 import os
 import json
 import asyncio
-import requests
 
-from typing import Union, List, Optional, Tuple
+from datetime import date, timedelta
+
+from typing import Dict, Union, List, Optional, Tuple
 
 from requests import Response
 
 from mbs.utils.structs import BaseStruct
 from mbs.utils.structs.jianshu import Category, NewCategory, Created, Updated, Published, Deleted, Error, OVER_FLOW
 
-from mbs.utils.settings import CONFIG_FILE_PATH
+from mbs.utils.settings import (
+    CONFIG_FILE_PATH,
+    ensure_config_folder,
+    JIANSHU_DAILY_POST_LIMIT,
+    JIANSHU,
+    HTTP_CACHE_TTLS,
+    IMAGE_UPLOAD_CONCURRENCY,
+)
 from mbs.utils.logger import child_logger
-from mbs.utils.exceptions import ConfigFileIsNull, ConfigFileNotFoundError
+from mbs.utils.exceptions import (
+    ConfigFileIsNull,
+    ConfigFileNotFoundError,
+    DailyQuotaExceededError,
+    VersionConflictError,
+)
+from mbs.utils.session import get_session_pool
+from mbs.utils.ratelimit import get_rate_limiter
+from mbs.utils.retry import request_with_retry
+from mbs.utils.httpcache import account_id, get_response_cache
+from mbs.utils.images import ImageStore, find_images, is_remote, replace_images
+from mbs.utils import qiniu
+from mbs.utils.singleflight import SingleFlight
+from mbs.utils.aio import LoopLocal
 
 Categories = List[Category]
 
+NOTEBOOKS_URL = "https://www.jianshu.com/author/notebooks"
+# 简书图片链接的处理参数：按 EXIF 旋转、去掉元数据、宽度不超过 1240
+IMAGE_STYLE = "?imageMogr2/auto-orient/strip%7CimageView2/2/w/1240"
+# 保存文章时 autosave_control 落后于简书中的版本（如在网页中编辑过）时的状态码
+VERSION_CONFLICT_STATUSES = {409, 422}
+
 logger = child_logger(__name__)
 
 
@@ -36,30 +63,36 @@ def parse_response(struct, resp: Response) -> Optional[BaseStruct]:
 
     Returns:
         BaseStruct: 解析过的结构体
+
+    Raises:
+        DailyQuotaExceededError: 当天发布的文章超过了简书的限制
     """
     if resp.status_code == 200:
         # 将字典转换为 Struct 类型
         return struct(resp.json())  # type: ignore
     else:
         error = Error(resp.json())
-        # TODO: 出错后，如果当前是在发布文章，则将当前文章进行标记，保存到数据库，
-        # 之后再运行程序时，跳过之前被标记的发布出错的文章，以免草稿中出现太多重复文章
         if error.error[0]["code"] == OVER_FLOW:
-            # TODO: 当天发布文章超过 2 篇，手动定时到明天发布。简书的定时发送是会员功能。
-            pass
+            # 当天发布文章超过 2 篇，由调用方放入推迟发布队列，简书的定时发送是会员功能
+            raise DailyQuotaExceededError(error.error[0].get("message", "当天发布的文章数已达上限"))
         logger.error(f"简书上传或更新文章失败：{error.error}，不再重试，跳过简书")
 
 
 class Jianshu:
     """简书 api"""
 
-    key = "jianshu"
+    key = JIANSHU
     headers = {
         "Accept": "application/json",
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:87.0) Gecko/20100101 Firefox/87.0",
     }
 
     def __init__(self, cookies: Optional[dict] = None):
+        # 同时更新的多篇文章引用了同一张图片时只上传一次，key 为 (平台, 内容指纹或原链接)
+        self._image_uploads = SingleFlight()
+        self._upload_tokens = qiniu.UploadTokens(self.__get_token_and_key_of_local_image)
+        # 同时上传（同时打开）的本地图片数
+        self._upload_limit = LoopLocal(lambda: asyncio.Semaphore(IMAGE_UPLOAD_CONCURRENCY))
         if not cookies:
             self.__read_config_from_file()
         else:
@@ -92,55 +125,105 @@ class Jianshu:
                 f.write(json.dumps(all_config))
                 f.truncate()
         except FileNotFoundError:
+            ensure_config_folder()
             with open(CONFIG_FILE_PATH, "w") as f:
                 f.write(json.dumps({self.key: {"cookies": self.cookies}}))
 
     def __get(self, url: str, headers: Optional[dict] = None) -> Response:
         if not headers:
             headers = self.headers
-        return requests.get(url, headers=headers, cookies=self.cookies)
+        return get_session_pool().request("GET", url, headers=headers, cookies=self.cookies)
 
     def __post(self, url: str, data: Optional[dict] = None, headers: Optional[dict] = None) -> Response:
         if not headers:
             headers = self.headers
         if data:
-            return requests.post(url, headers=headers, cookies=self.cookies, json=data)
+            return get_session_pool().request("POST", url, headers=headers, cookies=self.cookies, json=data)
         else:
-            return requests.post(url, headers=headers, cookies=self.cookies)
+            return get_session_pool().request("POST", url, headers=headers, cookies=self.cookies)
 
     def __put(self, url: str, data: Optional[dict], headers: Optional[dict] = None) -> Response:
         if not headers:
             headers = self.headers
 
-        return requests.put(url, headers=headers, cookies=self.cookies, json=data)
+        return get_session_pool().request("PUT", url, headers=headers, cookies=self.cookies, json=data)
+
+    async def __aget(self, url: str, headers: Optional[dict] = None) -> Response:
+        if not headers:
+            headers = self.headers
+        return await request_with_retry(self.key, "GET", url, headers=headers, cookies=self.cookies)
+
+    async def __apost(
+        self, url: str, data: Optional[dict] = None, headers: Optional[dict] = None, idempotent: bool = False
+    ) -> Response:
+        if not headers:
+            headers = self.headers
+        if data:
+            return await request_with_retry(
+                self.key, "POST", url, idempotent=idempotent, headers=headers, cookies=self.cookies, json=data
+            )
+        else:
+            return await request_with_retry(
+                self.key, "POST", url, idempotent=idempotent, headers=headers, cookies=self.cookies
+            )
+
+    async def __aput(self, url: str, data: Optional[dict], headers: Optional[dict] = None) -> Response:
+        if not headers:
+            headers = self.headers
 
-    def get_categories(self) -> Optional[Categories]:
-        url = "https://www.jianshu.com/author/notebooks"
-        resp = self.__get(url)
+        return await request_with_retry(self.key, "PUT", url, headers=headers, cookies=self.cookies, json=data)
+
+    @property
+    def _account(self) -> str:
+        return account_id(self.cookies)
+
+    def _notes_url(self, notebook_id: Union[str, int]) -> str:
+        return f"{NOTEBOOKS_URL}/{notebook_id}/notes"
+
+    def get_categories(self, refresh: bool = False) -> Optional[Categories]:
+        """获取全部文集
+
+        Args:
+            refresh (bool, optional): 是否丢弃缓存，重新下载文集列表
+        """
+        if refresh:
+            get_response_cache().invalidate(self.key, self._account, NOTEBOOKS_URL)
+        resp = get_response_cache().fetch(
+            self.key,
+            self._account,
+            NOTEBOOKS_URL,
+            HTTP_CACHE_TTLS["categories"],
+            lambda validators: self.__get(NOTEBOOKS_URL, {**self.headers, **validators}),
+        )
         if resp.status_code == 200:
             categories = []
-            for i in resp.json():
+            for i in resp.data:
                 categories.append(Category({"id": i["id"], "name": i["name"]}))
             return categories
-        logger.error(f"cookie 已过期：{resp.json()}")
+        logger.error(f"cookie 已过期：{resp.data}")
 
-    def __create_new_post(self, notebook_id: Union[str, int], title: str) -> Optional[BaseStruct]:
+    async def __create_new_post(self, notebook_id: Union[str, int], title: str) -> Optional[BaseStruct]:
         url = "https://www.jianshu.com/author/notes"
 
         data = {"notebook_id": str(notebook_id), "title": title, "at_bottom": False}
         logger.debug(f"正在向文集 [ {notebook_id} ] 中创建新文章：{title}")
-        resp = self.__post(url, data)
+        resp = await self.__apost(url, data)
         return parse_response(Created, resp)
 
-    async def __put_post(self, postid: int, title: str, content: str, db, version: int = 1):
+    async def __put_post(
+        self, postid: int, title: str, content: str, db, version: int = 1, replace_images: bool = True
+    ):
         url = "https://www.jianshu.com/author/notes/%d" % postid
 
         # 将 content 中所有的图片上传到简书，用简书反回的图片链接进行替换
-        content = await self._replace_all_images(content, db)
+        if replace_images:
+            content = await self._replace_all_images(content, db)
 
         data = {"id": str(postid), "autosave_control": version, "title": title, "content": content}
 
-        resp = self.__put(url, data)
+        resp = await self.__aput(url, data)
+        if resp.status_code in VERSION_CONFLICT_STATUSES:
+            raise VersionConflictError(f"状态码：{resp.status_code}，{resp.text[:200]}")
         return parse_response(Updated, resp)
 
     def __put_new_post(self, postid: int, title: str, content: str, db):
@@ -152,7 +235,8 @@ class Jianshu:
         data = {}
 
         logger.info(f"正在发布文章 => {url}")
-        resp = self.__post(url, data)
+        # 重复发布同一篇文章没有副作用
+        resp = await self.__apost(url, data, idempotent=True)
         logger.info(f"文章 {url} 已发布")
         return parse_response(Published, resp)
 
@@ -160,85 +244,223 @@ class Jianshu:
         url = f"https://www.jianshu.com/author/notes/{postid}/content"
         return self.__get(url).json()["content"]
 
-    async def new_post(self, notebook_id: Union[str, int], title: str, content: str, db) -> Tuple[str, Optional[int]]:
-        # 创建新文章时需要先用标题在指定文集中请求一个文章 id，后面用这个文章 id 发表文章
-        created = self.__create_new_post(notebook_id, title)
-        if not created:
-            logger.error("上传失败")
+    async def new_post(
+        self, notebook_id: Union[str, int], title: str, content: str, db, draft_id: Optional[int] = None
+    ) -> Tuple[str, Optional[int]]:
+        """发布新文章
+
+        简书每天最多发布 `JIANSHU_DAILY_POST_LIMIT` 篇新文章，配额用完后文章会进入推迟发布队列，
+        不再发出任何请求，以免草稿箱中出现无用的草稿。
+
+        Args:
+            notebook_id (Union[str, int]): 文集 id
+            title (str): 文章标题
+            content (str): 文章内容
+            db (DataBase): 数据库
+            draft_id (Optional[int], optional): 之前因配额用完而未发布的草稿 id，传入时用 content 更新此草稿后发布
+
+        Returns:
+            Tuple[str, Optional[int]]: 平台的 key 和文章 id
+        """
+        today = date.today().isoformat()
+        if db.quota_used(self.key, today) >= JIANSHU_DAILY_POST_LIMIT:
+            self.__defer_new_post(title, db, draft_id, "当天发布的文章数已达上限")
             return self.key, None
-        logger.debug(f"新文章《{title}》的 id {created.id} 已创建")
 
-        updated = await self.__put_new_post(created.id, title, content, db)
-        if not updated:
-            logger.error("上传失败")
-            return self.key, None
-        logger.debug(f"已上传新文章的内容：{title}")
+        await get_rate_limiter().acquire(self.key, "new")
 
-        published = await self.__publish_new_post(created["id"])
-        if not published:
+        postid = draft_id
+        try:
+            if postid:
+                # 推迟期间文章可能被修改过，先用当前内容更新草稿
+                logger.debug(f"发布之前推迟的文章《{title}》，草稿 id {postid}")
+                draft = await self._get_info_of_post(postid, db)
+                if not draft:
+                    logger.error(f"没找到草稿：{postid}")
+                    return self.key, None
+                updated = await self.__save_note(postid, draft, content, db, True)
+                if not updated:
+                    logger.error("更新草稿失败")
+                    return self.key, None
+            else:
+                # 创建新文章时需要先用标题在指定文集中请求一个文章 id，后面用这个文章 id 发表文章
+                created = await self.__create_new_post(notebook_id, title)
+                if not created:
+                    logger.error("上传失败")
+                    return self.key, None
+                postid = created.id
+                logger.debug(f"新文章《{title}》的 id {postid} 已创建")
+
+                updated = await self.__put_new_post(postid, title, content, db)
+                if not updated:
+                    logger.error("上传失败")
+                    return self.key, None
+                # 新文章第一次保存时的版本号为 1
+                db.save_jianshu_note(postid, int(notebook_id), title, 1)
+                logger.debug(f"已上传新文章的内容：{title}")
+
+            published = await self.__publish_new_post(postid)
+            if not published:
+                return self.key, None
+        except DailyQuotaExceededError as e:
+            # 本地记录的配额与简书不一致时，以简书为准，当天不再发布
+            db.use_quota(self.key, today, JIANSHU_DAILY_POST_LIMIT)
+            self.__defer_new_post(title, db, postid, str(e))
             return self.key, None
+        finally:
+            # 文集中新增了文章，或文章的版本号已经变化
+            get_response_cache().invalidate(self.key, self._account, self._notes_url(notebook_id))
+
+        db.use_quota(self.key, today)
 
         logger.info(f"新文章《{title}》已上传到 {self}")
 
-        db.update_new_post(title, jianshu_id=created.id)
+        db.update_new_post(title, jianshu_id=postid)
+        db.remove_deferred_post(title, self.key)
+
+        return self.key, postid
 
-        return self.key, created.id
+    def __defer_new_post(self, title: str, db, draft_id: Optional[int], reason: str):
+        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        db.defer_post(title, self.key, tomorrow, draft_id=draft_id, reason=reason)
+        logger.warning(f"{reason}，《{title}》将在 {tomorrow} 之后发布到{self}")
 
     def delete_post(self, postid: Union[str, int]) -> Optional[dict]:
         url = f"https://www.jianshu.com/author/notes/{postid}/soft_destroy"
 
         resp = self.__post(url)
+        # 不知道文章所在的文集，删除所有缓存
+        get_response_cache().invalidate(self.key, self._account)
         return parse_response(Deleted, resp)
 
-    async def update_post(self, postid: Union[str, int], content: str, db):
+    async def update_post(self, postid: Union[str, int], content: str, db, replace_images: bool = True) -> bool:
+        """更新文章
+
+        Args:
+            postid (Union[str, int]): 文章 id
+            content (str): 文章内容
+            db (DataBase): 数据库
+            replace_images (bool, optional): 是否需要上传并替换图片，已调用过 `_replace_all_images` 的内容传 False
 
-        # 奇葩简书不能更新太频繁，每次更新前休眠 2 秒
-        await asyncio.sleep(2)
+        Returns:
+            bool: 是否更新成功
+        """
 
-        post = await self._get_info_of_post(int(postid))
+        # 奇葩简书不能更新太频繁，所有更新任务共用一个令牌桶
+        await get_rate_limiter().acquire(self.key, "update")
+
+        postid = int(postid)
+        post = await self._get_info_of_post(postid, db)
         if not post:
             logger.error("没找到文章：%s" % postid)
-            return
+            return False
         title, version, _ = post
         logger.debug(f"原文章信息：id={postid}，title={title}，version={version}")
         logger.info("正在更新文章")
-        put_result = await self.__put_post(int(postid), title, content, db, version + 1)
-        if put_result["content_size_status"] != "fine":
+        put_result = await self.__save_note(postid, post, content, db, replace_images)
+        if not put_result or put_result["content_size_status"] != "fine":
             logger.error(f"文章更新失败：{put_result}")
-            return
+            return False
         logger.debug("更新的文章已保存到草稿箱，待发布")
-        await self.__publish_new_post(int(postid))
+        if not await self.__publish_new_post(postid):
+            logger.error(f"{self}中发布更新的文章《{title}》失败")
+            return False
         logger.info(f"{self}中已更新文章《{title}》")
-
-    async def _get_info_of_post(self, postid: int) -> Optional[Tuple[str, int, int]]:
-        notebook_id = self.__select_category_for_post(postid)
-        url = f"https://www.jianshu.com/author/notebooks/{notebook_id}/notes"
+        return True
+
+    async def __save_note(
+        self, postid: int, post: Tuple[str, int, int], content: str, db, replace_images: bool
+    ) -> Optional[BaseStruct]:
+        """保存文章，版本号冲突时从文章列表中查询最新的版本号后再保存一次
+
+        其他失败（网络错误、5xx 等）由重试层处理，不查询文章列表。
+
+        Args:
+            postid (int): 文章 id
+            post (Tuple[str, int, int]): `_get_info_of_post` 返回的标题、版本号和文集 id
+            content (str): 文章内容
+            db (DataBase): 数据库
+            replace_images (bool): 是否需要上传并替换图片
+
+        Returns:
+            Optional[BaseStruct]: 保存结果，失败时为 None
+        """
+        title, version, notebook_id = post
+        try:
+            return await self.__update_note(postid, notebook_id, title, content, db, version, replace_images)
+        except VersionConflictError as e:
+            # 本地记录的版本号落后于简书（如在网页中编辑过），只有这时才查询文章列表
+            latest = await self._get_info_of_post(postid, db, refresh=True)
+            if not latest or latest[1] == version:
+                logger.error(f"简书文章 {postid} 的版本冲突：{e}")
+                return None
+        title, version, notebook_id = latest
+        logger.warning(f"简书中的文章版本为 {version}，与本地记录的不一致，重新更新")
+        try:
+            return await self.__update_note(postid, notebook_id, title, content, db, version, replace_images)
+        except VersionConflictError as e:
+            logger.error(f"简书文章 {postid} 的版本冲突：{e}")
+            return None
+
+    async def __update_note(
+        self, postid: int, notebook_id: int, title: str, content: str, db, version: int, replace_images: bool
+    ) -> Optional[BaseStruct]:
+        """用下一个版本号保存文章，成功后记录新的版本号"""
+        try:
+            put_result = await self.__put_post(postid, title, content, db, version + 1, replace_images)
+        finally:
+            # 无论是否成功，文章列表中的版本号都可能已经变化
+            get_response_cache().invalidate(self.key, self._account, self._notes_url(notebook_id))
+        if put_result is not None:
+            db.save_jianshu_note(postid, notebook_id, title, version + 1)
+        return put_result
+
+    async def _get_info_of_post(self, postid: int, db, refresh: bool = False) -> Optional[Tuple[str, int, int]]:
+        """获取文章的标题、版本号和所在文集 id
+
+        优先使用数据库中记录的版本号，没有记录（如之前版本上传的文章）或 `refresh` 为 True 时
+        才下载文集的文章列表。
+
+        Args:
+            postid (int): 文章 id
+            db (DataBase): 数据库
+            refresh (bool, optional): 是否忽略本地记录和缓存，从简书获取最新的文章列表
+
+        Returns:
+            Optional[Tuple[str, int, int]]: 标题、版本号和文集 id
+        """
+        note = None if refresh else db.select_jianshu_note(postid)
+        if note:
+            notebook_id, title, version = note
+            return title, version, notebook_id
+
+        notebook_id = db.select_jianshu_notebook_of_post(postid) or 0
+        url = self._notes_url(notebook_id)
+        if refresh:
+            get_response_cache().invalidate(self.key, self._account, url)
         logger.debug(f"正在访问 {url}")
-        resp = self.__get(url)
-        for note in resp.json():
+        resp = await get_response_cache().afetch(
+            self.key,
+            self._account,
+            url,
+            HTTP_CACHE_TTLS["notes"],
+            lambda validators: self.__aget(url, {**self.headers, **validators}),
+        )
+        if resp.status_code != 200:
+            logger.error(f"获取文集 {notebook_id} 中的文章列表失败：{resp.data}")
+            return None
+        for note in resp.data:
             if note["id"] == postid:
+                db.save_jianshu_note(postid, notebook_id, note["title"], note["autosave_control"])
                 return note["title"], note["autosave_control"], notebook_id
         logger.error(f"没有找到 postid={postid} 的文章")
-
-    def __select_category_for_post(self, postid: int):
-        from mbs.utils.database.sqlite import DataBase
-
-        db = DataBase()
-        sql = (
-            "SELECT c.jianshu_id FROM categories as c WHERE c.id = (SELECT p.category_id FROM posts p WHERE"
-            " p.jianshu_id = %d)" % postid
-        )
-        logger.debug(sql)
-        row = db.execute(sql).fetchone()
-        if not row:
-            return 0
-        return row[0]
+        return None
 
     def new_category(self, category: str) -> Optional[int]:
-        url = "https://www.jianshu.com/author/notebooks"
         data = {"name": category}
 
-        resp = self.__post(url, data)
+        resp = self.__post(NOTEBOOKS_URL, data)
+        get_response_cache().invalidate(self.key, self._account, NOTEBOOKS_URL)
         if resp.status_code == 200:
             result = NewCategory(resp.json())
             return result.id
@@ -247,68 +469,101 @@ class Jianshu:
             logger.error(f"简书添加新分类出错：{error.error}")
 
     def update_category(self, category_id: Union[str, int], category: str) -> bool:
-        url = f"https://www.jianshu.com/author/notebooks/{category_id}"
+        url = f"{NOTEBOOKS_URL}/{category_id}"
         data = {"name": category}
 
         resp = self.__put(url, data)
+        get_response_cache().invalidate(self.key, self._account, NOTEBOOKS_URL)
         return resp.status_code == 204
 
     def delete_category(self, category_id: Union[str, int]) -> int:
-        url = f"https://www.jianshu.com/author/notebooks/{category_id}/soft_destroy"
-        return self.__post(url).status_code
+        url = f"{NOTEBOOKS_URL}/{category_id}/soft_destroy"
+        status_code = self.__post(url).status_code
+        get_response_cache().invalidate(self.key, self._account, NOTEBOOKS_URL)
+        return status_code
 
     async def _replace_all_images(self, content: str, db) -> str:
-        import re
-
-        imgs = re.findall(r"!\[.+?\]\((.+?)\)", content)
-
-        imgs = list(set(imgs))
+        imgs = find_images(content)
+        if not imgs:
+            return content
 
-        amount = len(imgs)
-
-        new_imgs = []
-        tasks = []
-
-        for i in range(amount):
-            new_img = db.is_uploaded(imgs[i])
-            if new_img:
-                logger.info(f"外链图片 {imgs[i]} 已向简书上传过 => {new_img}")
-                new_imgs.append((imgs[i], new_img))
-            else:
-                tasks.append(self.upload_image(imgs[i], db))
+        store = ImageStore(db, imgs)
+        try:
+            digests = await store.digests(imgs)
 
-        if tasks:
-            logger.info("正在向简书上传文档内未上传过的图片...")
-            uploaded_imgs = await asyncio.gather(*tasks, return_exceptions=True)
-            logger.info("已上传所有图片")
-            new_imgs.extend(uploaded_imgs)
+            # 原链接 => 简书图床中的链接
+            urls = {}
+            # 内容指纹（没有指纹时为原链接）=> (指纹, 引用这张图片的原链接)，内容相同的图片只上传一次
+            pending: Dict[str, Tuple[Optional[str], List[str]]] = {}
 
-        if new_imgs:
-            new_imgs = set(new_imgs)
             for img in imgs:
-                for new_img in new_imgs:
-                    if new_img[0] == img:
-                        content = content.replace(
-                            img, new_img[1] + "?imageMogr2/auto-orient/strip%7CimageView2/2/w/1240"
+                digest = digests[img]
+                new_img = store.hosted_url(self.key, digest)
+                if not new_img:
+                    # 之前只按链接记录的图片
+                    new_img = db.is_uploaded(img)
+                    if new_img:
+                        store.save(self.key, digest, new_img)
+                if new_img:
+                    logger.info(f"图片 {img} 已向简书上传过 => {new_img}")
+                    urls[img] = new_img
+                else:
+                    pending.setdefault(digest or img, (digest, []))[1].append(img)
+
+            if pending:
+                logger.info("正在向简书上传文档内未上传过的图片...")
+                keys = list(pending)
+                uploaded_imgs = await asyncio.gather(
+                    *(
+                        self._image_uploads.run(
+                            (self.key, key), lambda d=digest, src=sources[0]: self.__upload_and_save(src, d, store, db)
                         )
-                        new_imgs.remove(new_img)
-                        break
-
-        return content
-
-    def __get_token_and_key_of_local_image(self, filename: str) -> Tuple[str, str]:
+                        for key, (digest, sources) in pending.items()
+                    ),
+                    return_exceptions=True,
+                )
+                logger.info("已上传所有图片")
+                for key, uploaded in zip(keys, uploaded_imgs):
+                    # 上传失败的图片（异常或 None）保留原链接
+                    if not isinstance(uploaded, tuple):
+                        continue
+                    for img in pending[key][1]:
+                        urls[img] = uploaded[1]
+        finally:
+            store.close()
+
+        return replace_images(content, {raw: url + IMAGE_STYLE for raw, url in urls.items()})
+
+    async def __upload_and_save(
+        self, source: str, digest: Optional[str], store: ImageStore, db
+    ) -> Optional[Tuple[str, str]]:
+        # 只为真正开始的上传预取凭证：其他文章正在上传同一张图片时不会执行到这里。
+        # 凭证在等待上传名额时就在后台请求，上传受并发数限制
+        if not is_remote(source) and os.path.isfile(source):
+            self._upload_tokens.prefetch([source])
+        try:
+            uploaded = await self.upload_image(source, db)
+        finally:
+            # 没有用到的凭证（如上传前出错）不留在长期运行的客户端中
+            self._upload_tokens.discard(source)
+        # 在任务内保存结果，任务结束后再来的调用方能从数据库中查到
+        if isinstance(uploaded, tuple):
+            store.save(self.key, digest, uploaded[1])
+        return uploaded
+
+    async def __get_token_and_key_of_local_image(self, filename: str) -> Tuple[str, str]:
         logger.debug("正在向简书请求上传图片的认证 token")
         url = f"https://www.jianshu.com/upload_images/token.json?filename={filename}"
         headers = self.headers.copy()
         headers["Accept"] = "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"
-        resp = self.__get(url, headers=headers)
+        resp = await self.__aget(url, headers=headers)
         return resp.json()["token"], resp.json()["key"]
 
     async def upload_image(self, path_or_url: str, db) -> Optional[Tuple[str, str]]:
         if path_or_url.startswith("http"):
             logger.info(f"正在上传远程图片 {path_or_url}")
             url = "https://www.jianshu.com/upload_images/fetch"
-            resp = self.__post(url, data={"url": path_or_url})
+            resp = await self.__apost(url, data={"url": path_or_url})
         else:
             if not os.path.exists(path_or_url):
                 logger.error(f"没有找到文件 {path_or_url}")
@@ -316,21 +571,11 @@ class Jianshu:
 
             logger.info(f"正在上传本地图片 {path_or_url}")
 
-            filename = os.path.basename(path_or_url).replace(" ", "_")
-
-            token, key = self.__get_token_and_key_of_local_image(filename)
-
-            print(token)
-
-            # 根据 token 和 key 上传图片
-            url = "https://upload.qiniup.com/"
-            params = {
-                "token": (None, token),
-                "key": (None, key),
-                "file": (filename, open(path_or_url, "rb")),
-                "x:protocol": "https",
-            }
-            resp = requests.post(url, files=params)
+            # 根据 token 和 key 上传图片，限制同时上传（同时打开）的文件数。
+            # 凭证在拿到上传名额后才取出，等待期间快要过期的凭证会重新请求
+            async with self._upload_limit.get():
+                token, key = await self._upload_tokens.take(path_or_url)
+                resp = await qiniu.upload(path_or_url, token, key)
         try:
             if "url" in resp.json():
                 logger.info("图片上传成功，本地或远程地址：%s，上传到简书后返回的地址：%s", path_or_url, resp.json()["url"])
@@ -4,21 +4,31 @@
 # @Email: thepoy@163.com
 # @File Name: segmentfault.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-10-14 11:00:40
+# @Modified: 2026-10-18 03:33:21
 
 import asyncio
 import sys
+import time
 
-from typing import Union, Optional, Dict, List, Tuple
+from typing import Iterable, Union, Optional, Dict, List, Tuple
 
 from mbs.blogs import LoginedBaseBlog
+from mbs.utils.settings import SEGMENT_FAULT, HTTP_CACHE_TTLS, SF_TAG_TTL, SF_TAG_NEGATIVE_TTL
 from mbs.utils.logger import child_logger
+from mbs.utils.ratelimit import get_rate_limiter
+from mbs.utils.httpcache import account_id, get_response_cache
+from mbs.utils.singleflight import SingleFlight
 
 logger = child_logger(__name__)
 
 
 class SegmentFault(LoginedBaseBlog):
-    key = "segment_fault"
+    key = SEGMENT_FAULT
+
+    def __init__(self, auth_dict: dict = None):
+        super().__init__(auth_dict)
+        # 同时查询同一个标签的多篇文章共用一个请求
+        self._tag_lookups = SingleFlight()
 
     def _input_auth_info(self) -> Dict[str, str]:
         cookie = input("输入思否 cookie：\n")
@@ -38,8 +48,11 @@ class SegmentFault(LoginedBaseBlog):
     async def update_post(
         self, postid: Union[str, int], content: str, db, tags_str: List[str] = None, title: Optional[str] = None
     ) -> bool:
-        revisions = self._revisions(int(postid))
+        revisions = await self._revisions(int(postid))
         logger.debug(f"最新版本：{revisions}")
+        if not revisions:
+            logger.error(f"没有找到文章 id={postid} 的版本信息，跳过{self}")
+            return False
 
         if not title:
             title = revisions["title"]
@@ -51,7 +64,7 @@ class SegmentFault(LoginedBaseBlog):
             logger.debug(f"查询到的所有标签 id => {tags}")
 
         # TODO: 不管是创建还是更新都需要创建一个草稿，此步是否必要存疑
-        draft_id = self._draft(postid, title, content, tags)
+        draft_id = await self._draft(postid, title, content, tags)
 
         url = f"https://gateway.segmentfault.com/article/{postid}"
 
@@ -70,7 +83,11 @@ class SegmentFault(LoginedBaseBlog):
         }
 
         logger.debug(f"即将更新文章 id={postid}")
-        resp = self._put(url, data)
+        try:
+            resp = await self._aput(url, data)
+        finally:
+            # 更新后会产生新的版本
+            get_response_cache().invalidate(self.key, self._account, self._revisions_url(int(postid)))
 
         if resp.status_code != 200:
             logger.error(f"状态码：{resp.status_code}，错误响应：{resp.text}")
@@ -78,19 +95,32 @@ class SegmentFault(LoginedBaseBlog):
         logger.info(f"{self}中已更新文章《{title}》")
         return bool(resp.json()["data"]["id"])
 
-    def _revisions(self, postid: int) -> Optional[dict]:
-        url = f"https://gateway.segmentfault.com/revisions?object_id={postid}"
+    @property
+    def _account(self) -> str:
+        return account_id(self.headers.get("cookie"), self.headers.get("token"))
+
+    def _revisions_url(self, postid: int) -> str:
+        return f"https://gateway.segmentfault.com/revisions?object_id={postid}"
+
+    async def _revisions(self, postid: int) -> Optional[dict]:
+        url = self._revisions_url(postid)
         logger.debug(f"生成版本查询链接 {url}，即将访问此链接")
-        resp = self._get(url)
+        resp = await get_response_cache().afetch(
+            self.key,
+            self._account,
+            url,
+            HTTP_CACHE_TTLS["revisions"],
+            lambda validators: self._aget(url, {**self.headers, **validators}),
+        )
 
         if resp.status_code == 200:
             # 返回的是一个根据创建时间倒序排列的列表，第一个是最新版本
-            return resp.json()[0]
+            return resp.data[0]
         else:
-            logger.error(f"状态码：{resp.status_code}，错误响应：{resp.text}")
+            logger.error(f"状态码：{resp.status_code}，错误响应：{resp.data}")
             return None
 
-    def _draft(self, postid, title, content, tags: List[int]) -> Optional[int]:
+    async def _draft(self, postid, title, content, tags: List[int]) -> Optional[int]:
         """生成草稿
 
         Args:
@@ -106,7 +136,7 @@ class SegmentFault(LoginedBaseBlog):
         data = {"title": title, "tags": tags, "text": content, "object_id": postid, "type": "article", "cover": None}
 
         logger.debug("正在创建草稿")
-        resp = self._post(url, data)
+        resp = await self._apost(url, data)
         if resp.status_code == 200 or resp.status_code == 201:
             logger.debug(f"已创建草稿，草稿 id = {resp.json()['id']}")
             return resp.json()["id"]
@@ -114,41 +144,68 @@ class SegmentFault(LoginedBaseBlog):
             logger.error(f"状态码：{resp.status_code}，错误响应：{resp.text}")
             return None
 
-    async def search_tag(self, tag: str, db) -> Optional[int]:
+    async def search_tag(self, tag: str) -> Optional[int]:
+        """在思否中查询标签 id
+
+        Returns:
+            Optional[int]: 标签 id，思否中没有此标签时为 0，请求失败时为 None
+        """
         url = f"https://gateway.segmentfault.com/tags?query=search&q={tag}"
         logger.debug(f"正在查询 tag [ {tag} ]")
-        resp = self._get(url)
+        resp = await self._aget(url)
         if resp.status_code == 200:
             result = resp.json()["rows"]
-            sf_id = result[0]["id"] if result else 0
-
-            if sf_id:
-                if db.category_exists(tag):
-                    logger.debug(f"数据库中已有此分类 {tag}，更新 `segment_fault_id` 字段为 [ {sf_id} ]")
-                    db.update_category(tag, sf_id=sf_id)
-                else:
-                    logger.debug(f"在数据库中创建分类 {tag} => `segment_fault_id` =  {sf_id}")
-                    db.insert_category(tag, sf_id=sf_id)
-
-            return sf_id
+            return result[0]["id"] if result else 0
         else:
             logger.error(f"状态码：{resp.status_code}，错误响应：{resp.text}")
             return None
 
-    async def search_tags(self, tags: List[str], db) -> List[int]:
-        logger.debug(f"正在查询多个标签 {tags}")
-        tasks = [asyncio.create_task(self.search_tag(tag, db)) for tag in tags]
+    async def resolve_tags(self, tags: Iterable[str], db) -> Dict[str, Optional[int]]:
+        """把标签名解析为思否的标签 id
 
-        result = await asyncio.gather(*tasks)
+        先使用数据库中未过期的缓存（包括不存在的标签），其余的标签并发查询，
+        查询结果在一个事务中写入数据库。
 
-        return [i for i in result if i and type(i) == int]
+        Args:
+            tags (Iterable[str]): 标签名，可以重复
+            db (TYPE): 数据库
+
+        Returns:
+            Dict[str, Optional[int]]: 标签名 => 标签 id，思否中没有此标签或查询失败时为 None
+        """
+        names = list(dict.fromkeys(tags))
+        now = time.time()
+        result: Dict[str, Optional[int]] = {}
+        for name, (sf_id, sync_time) in db.select_sf_tags(names).items():
+            if now - sync_time < (SF_TAG_TTL if sf_id else SF_TAG_NEGATIVE_TTL):
+                result[name] = sf_id
+        if len(result) < len(names):
+            logger.debug(f"命中 {len(result)} 个标签缓存，{len(names) - len(result)} 个需要查询")
+
+        missing = [name for name in names if name not in result]
+        found = await asyncio.gather(
+            *(self._tag_lookups.run(name, lambda n=name: self.search_tag(n)) for name in missing)
+        )
+        # 请求失败的标签不缓存，下次重新查询
+        fetched = {name: sf_id or None for name, sf_id in zip(missing, found) if sf_id is not None}
+        if fetched:
+            db.save_sf_tags(fetched)
+        result.update(fetched)
+        return result
+
+    async def search_tags(self, tags: List[str], db) -> List[int]:
+        logger.debug(f"正在查询多个标签 {tags}")
+        ids = await self.resolve_tags(tags, db)
+        return [ids[tag] for tag in dict.fromkeys(tags) if ids.get(tag)]  # type: ignore
 
     async def new_post(self, title: str, content: str, tags: List[int], db) -> Tuple[str, Optional[int]]:
         if not self.key:
             logger.fatal("没有定义 key")
             sys.exit(1)
+        await get_rate_limiter().acquire(self.key, "new")
+
         # TODO: 未测试是否必须创建先草稿
-        draft_id = self._draft("", title, content, tags)
+        draft_id = await self._draft("", title, content, tags)
 
         url = "https://gateway.segmentfault.com/article"
         data = {
@@ -165,7 +222,7 @@ class SegmentFault(LoginedBaseBlog):
         }
 
         logger.debug(f"正在上传新文章：{title}")
-        resp = self._post(url, data)
+        resp = await self._apost(url, data)
         if resp.status_code == 201:
 
             logger.info(f"新文章《{title}》已上传到 {self}")
@@ -4,18 +4,19 @@
 # @Email: thepoy@163.com
 # @File Name: site.py
 # @Created: 2021-05-13 16:40:03
-# @Modified: 2021-08-02 06:54:13
+# @Modified: 2026-10-18 03:22:29
 
 import json
 import os
 import time
 import re
 import uuid
+import socket
 import paramiko
 
 from typing import Optional, List
 
-from mbs.utils.settings import CONFIG_FILE_PATH
+from mbs.utils.settings import CONFIG_FILE_PATH, ensure_config_folder, CONNECT_TIMEOUT, READ_TIMEOUT
 from mbs.utils.logger import child_logger
 
 logger = child_logger(__name__)
@@ -44,11 +45,15 @@ class Site:
 
     def connect_remote(self):
         logger.debug(f"创建与 [ {self.addr} ] 的传输通道...")
-        self.transport = paramiko.Transport((self.addr, 22))
+        sock = socket.create_connection((self.addr, 22), timeout=CONNECT_TIMEOUT)
+        self.transport = paramiko.Transport(sock)
+        self.transport.banner_timeout = CONNECT_TIMEOUT
+        self.transport.auth_timeout = CONNECT_TIMEOUT
         logger.debug(f"进行用户 [ {self.user} ] 认证，建立远程连接...")
         self.transport.connect(username=self.user, password=self.passwd)
         logger.debug("认证成功，远程连接已创建，创建 sftp 连接...")
         self.sftp = paramiko.SFTPClient.from_transport(self.transport)
+        self.sftp.get_channel().settimeout(READ_TIMEOUT)  # type: ignore
 
     def __read_config_from_file(self):
         try:
@@ -94,6 +99,7 @@ class Site:
                 f.write(json.dumps(all_config))
                 f.truncate()
         except FileNotFoundError:
+            ensure_config_folder()
             with open(CONFIG_FILE_PATH, "w") as f:
                 f.write(
                     json.dumps(
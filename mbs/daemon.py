@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: daemon.py
+# @Created: 2026-10-18 12:14:51
+# @Modified: 2026-10-18 03:52:51
+
+"""后台服务
+
+`mbs --serve` 启动后，管理器、各平台的会话和连接池、博客园的 XML-RPC 连接和数据库连接
+在进程中一直保留，之后的 `mbs` 命令只把参数通过 Unix socket 发给后台服务执行，
+不再每次读取配置、创建客户端和同步分类。
+
+协议为一行 JSON 请求 `{"argv": [...], "cwd": "..."}`，一行 JSON 响应 `{"code": 0, "output": "..."}`。
+请求按到达顺序逐个执行。
+"""
+
+import os
+import json
+import socket
+import socketserver
+
+from typing import Callable, List, Optional, Tuple
+
+from mbs.utils.settings import DAEMON_TIMEOUT, SOCKET_PATH, ensure_config_folder
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+# 参数列表, 工作目录 => (退出码, 输出)
+Runner = Callable[[List[str], str], Tuple[int, str]]
+
+
+def supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            argv, cwd = request["argv"], request.get("cwd") or os.getcwd()
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"无效的请求：{line!r}")
+            return
+
+        logger.info(f"执行命令：mbs {' '.join(argv)}")
+        code, output = self.server.runner(argv, cwd)  # type: ignore
+        try:
+            self.wfile.write(json.dumps({"code": code, "output": output}).encode("utf-8") + b"\n")
+        except BrokenPipeError:
+            logger.warning("客户端已断开，命令的输出被丢弃")
+
+
+class _Server(socketserver.UnixStreamServer):
+    def __init__(self, path: str, runner: Runner):
+        self.runner = runner
+        super().__init__(path, _Handler)
+
+
+def _is_running(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def serve(runner: Runner, path: str = SOCKET_PATH) -> int:
+    """启动后台服务，直到收到 Ctrl+C
+
+    Args:
+        runner (Runner): 执行一条命令的函数
+        path (str, optional): Unix socket 路径
+
+    Returns:
+        int: 退出码
+    """
+    if not supported():
+        logger.error("当前系统不支持 Unix socket，无法启动后台服务")
+        return 1
+
+    if os.path.exists(path):
+        if _is_running(path):
+            logger.error(f"后台服务已在运行：{path}")
+            return 1
+        # 上次没有正常退出留下的 socket 文件
+        os.remove(path)
+
+    ensure_config_folder()
+    # 在 bind 时就以 0600 创建 socket 文件，之后再 chmod 会有一段时间其他用户也能连接
+    umask = os.umask(0o177)
+    try:
+        server = _Server(path, runner)
+    finally:
+        os.umask(umask)
+    logger.info(f"后台服务已启动：{path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("后台服务已停止")
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+    return 0
+
+
+def request(argv: List[str], path: str = SOCKET_PATH, timeout: float = DAEMON_TIMEOUT) -> Optional[Tuple[int, str]]:
+    """把命令交给后台服务执行
+
+    Args:
+        argv (List[str]): 命令行参数
+        path (str, optional): Unix socket 路径
+        timeout (float, optional): 等待结果的最长秒数，超时或结果无效时返回错误信息
+
+    Returns:
+        Optional[Tuple[int, str]]: 退出码和输出，后台服务没有运行时返回 None
+    """
+    if not supported() or not os.path.exists(path):
+        return None
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError:
+            return None
+        try:
+            sock.sendall(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        except socket.timeout:
+            return 1, f"后台服务 {timeout:.0f} 秒内没有返回结果，可能已卡住，请重启后台服务或加上 --local 执行\n"
+        except OSError as e:
+            return 1, f"与后台服务通信失败：{e}，请查看日志或加上 --local 执行\n"
+    if not line:
+        return 1, "后台服务没有返回结果，请查看日志\n"
+    try:
+        response = json.loads(line)
+        return response["code"], response["output"]
+    except (ValueError, KeyError, TypeError):
+        return 1, f"后台服务返回了无效的结果：{line[:200]!r}，请查看日志或加上 --local 执行\n"
@@ -4,66 +4,295 @@
 # @Email: thepoy@163.com
 # @File Name: manager.py
 # @Created:  2021-04-13 14:57:51
-# @Modified: 2021-10-14 11:17:39
+# @Modified: 2026-10-18 03:51:52
 
+import os
 import sys
 import time
 import asyncio
 
-from typing import Union, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional, Set, Tuple, Union, List
 
-from mbs.blogs.cnblogs import create_post, CnblogsMetaWeblog
-from mbs.blogs.jianshu import Jianshu
-from mbs.blogs.segmentfault import SegmentFault
-from mbs.utils.common import read_post_from_file, parse_cookies, remove_yaml_header, get_md5_of_file
+from mbs.utils.structs.meta_weblog import create_post
+from mbs.utils.common import read_post_from_file, read_post_and_md5, parse_cookies, remove_yaml_header
+from mbs.utils.aio import LoopLocal
 from mbs.utils.database.sqlite import DataBase
-from mbs.utils.exceptions import ConfigFileNotFoundError, CookiesExpiredError, ConfigFileIsNull
+from mbs.utils.exceptions import (
+    AuthInfoRequiredError,
+    ConfigFileNotFoundError,
+    CookiesExpiredError,
+    ConfigFileIsNull,
+    CircuitOpenError,
+)
 from mbs.utils.logger import child_logger
-from mbs.utils.settings import YES_CODE, NO_CODE, UPDATED_CODE
+from mbs.utils.pipeline import Pipeline
+from mbs.utils.watcher import FolderWatcher
+from mbs.utils.filecache import StatCache
+from mbs.utils.hashing import (
+    DEFAULT_ALGORITHM,
+    fingerprint_algorithm,
+    fingerprint_text,
+    hash_file,
+    hash_files,
+    migrate_fingerprints,
+    same_fingerprint,
+    supports_algorithm,
+)
+from mbs.utils.settings import (
+    YES_CODE,
+    NO_CODE,
+    UPDATED_CODE,
+    JIANSHU_DAILY_POST_LIMIT,
+    CATEGORY_SYNC_TTL,
+    CATEGORY_SYNC_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_WORKERS,
+    PLATFORM_CONCURRENCY,
+    SYNC_OK,
+    SYNC_FAILED,
+    JIANSHU,
+    CNBLOGS,
+    SEGMENT_FAULT,
+)
+
+if TYPE_CHECKING:
+    from mbs.blogs.cnblogs import CnblogsMetaWeblog
+    from mbs.blogs.jianshu import Jianshu
+    from mbs.blogs.segmentfault import SegmentFault
 
 logger = child_logger(__name__)
 
 
-def input_auth_info_of_cnblogs() -> CnblogsMetaWeblog:
+def input_auth_info_of_cnblogs() -> "CnblogsMetaWeblog":
+    from mbs.blogs.cnblogs import CnblogsMetaWeblog
+
     blog_name = input("请输入博客园的博客名：")
     username = input("请输入博客园用户名：")
     password = input("请输入博客园密码：")
     return CnblogsMetaWeblog(blog_name=blog_name, username=username, password=password)
 
 
+async def _gather(*tasks):
+    """等待所有任务完成，某个平台出错时只记录日志，不影响其他平台的任务"""
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, CircuitOpenError):
+            logger.warning(str(result))
+        elif isinstance(result, Exception):
+            logger.error(f"任务执行失败：{result!r}")
+    return results
+
+
+def _platforms_of_post(jianshu_id, cnblogs_id, sf_id) -> List[str]:
+    """文章已上传到的平台"""
+    ids = ((JIANSHU, jianshu_id), (CNBLOGS, cnblogs_id), (SEGMENT_FAULT, sf_id))
+    return [platform for platform, id_ in ids if id_]
+
+
+def _payload_fingerprint(
+    platform: str, title: str, content: str, category: str, algorithm: Optional[str] = None
+) -> str:
+    """平台实际收到的内容的指纹
+
+    简书的图片链接由原链接唯一确定，所以用替换图片前的内容计算。
+
+    Args:
+        platform (str): 平台的 key
+        title (str): 文章标题
+        content (str): 删除 yaml 头后的文章内容
+        category (str): 文章分类
+        algorithm (Optional[str], optional): 指纹算法，默认为配置的算法
+
+    Returns:
+        str: 指纹
+    """
+    if platform == CNBLOGS:
+        post = create_post(title, content, category)
+        return fingerprint_text(post["title"], post["description"], *post["categories"], algorithm=algorithm)
+    return fingerprint_text(title, content, algorithm=algorithm)
+
+
+def _platforms_behind(
+    platforms: List[str], title: str, content: str, category: str, states: Dict[str, Optional[str]]
+) -> Tuple[Set[str], Dict[str, str]]:
+    """找出收到的内容会发生变化的平台
+
+    Args:
+        platforms (List[str]): 文章已上传到的平台
+        title (str): 文章标题
+        content (str): 删除 yaml 头后的文章内容
+        category (str): 文章分类
+        states (Dict[str, Optional[str]]): 平台 => 最后一次推送成功的内容指纹
+
+    Returns:
+        Tuple[Set[str], Dict[str, str]]: 落后的平台，以及各平台当前内容的指纹
+    """
+    fingerprints = {platform: _payload_fingerprint(platform, title, content, category) for platform in platforms}
+    behind = set()
+    for platform in platforms:
+        stored = states.get(platform)
+        if not stored:
+            behind.add(platform)
+            continue
+        # 更换过指纹算法时用记录时的算法计算，避免内容没变的平台被重新推送
+        algorithm = fingerprint_algorithm(stored)
+        if algorithm == DEFAULT_ALGORITHM:
+            expected = fingerprints[platform]
+        elif supports_algorithm(algorithm):
+            expected = _payload_fingerprint(platform, title, content, category, algorithm)
+        else:
+            expected = None
+        if not same_fingerprint(stored, expected):
+            behind.add(platform)
+    return behind, fingerprints
+
+
+def _compare_post(row: tuple, current: str, migrations: List[Tuple[int, Dict[str, str]]]) -> bool:
+    """对比文章文件与 posts 表中记录的指纹
+
+    posts 表中用其他算法记录的指纹与文件内容一致时视为未修改，并加入 `migrations`，由调用方写回数据库。
+
+    Args:
+        row (tuple): `select_md5_of_all_posts` 查询到的一行
+        current (str): 文件当前的指纹
+        migrations (List[Tuple[int, Dict[str, str]]]): 需要迁移的指纹，(文章 id, {旧指纹 => 新指纹})
+
+    Returns:
+        bool: 文件是否与 posts 表中记录的不同
+    """
+    post_id, _, md5, _, _, _, file_path = row
+    migrated = migrate_fingerprints(file_path, current, [md5])
+    if migrated:
+        migrations.append((post_id, migrated))
+        md5 = migrated[md5]
+    return not same_fingerprint(current, md5)
+
+
+@dataclass
+class _UpdateJob:
+    """update_all_posts 流水线中的一篇待更新文章"""
+
+    post_id: int
+    title: str
+    file_path: str
+    md5: str
+    content: str
+    uploaded_to: List[str]
+    platforms: Set[str] = field(default_factory=set)
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    category: str = ""
+    jianshu_content: Optional[str] = None
+    pushed: bool = True
+
+
 class AllBlogsManager:
     """博客管理器"""
 
-    def __init__(self):
-        try:
-            self.jianshu = Jianshu()
-        except (ConfigFileNotFoundError, ConfigFileIsNull, FileNotFoundError):
-            print("没有找到配置文件，需要输入认证信息来生成配置文件")
-            cookies = input("请输入已登录的简书 cookies：")
-            self.jianshu = Jianshu(parse_cookies(cookies))
+    def __init__(self, interactive: bool = True):
+        """初始化函数
 
-            self.cnblogs = input_auth_info_of_cnblogs()
+        Args:
+            interactive (bool, optional): 缺少认证信息或 cookies 过期时能否在终端输入，
+                为 False 时抛出 `AuthInfoRequiredError`
+        """
+        self.interactive = interactive
 
-            # TODO: token 好像就是 cookie 中的  PHPSESSIONID
-            cookies = input("请输入思否的 cookies:")
-            token = input("请输入思否的 token:")
-            self.sf = SegmentFault({"cookie": cookies, "token": token})
-        else:
-            self.cnblogs = CnblogsMetaWeblog()
-            self.sf = SegmentFault()
+        # 各平台的客户端在第一次用到时才创建，只访问本地数据库的命令不需要联网
+        self._jianshu: Optional["Jianshu"] = None
+        self._cnblogs: Optional["CnblogsMetaWeblog"] = None
+        self._sf: Optional["SegmentFault"] = None
+        self._categories_synced = False
 
         self.db = DataBase()
 
+        # 本次运行中已完成并写入数据库的文章，时限到期时用于汇报进度
+        self.finished_posts: List[str] = []
+        self.deadline_exceeded = False
+
+        self._platform_limits = LoopLocal(lambda: {k: asyncio.Semaphore(v) for k, v in PLATFORM_CONCURRENCY.items()})
+
+    def _input_auth_info(self):
+        from mbs.blogs.jianshu import Jianshu
+        from mbs.blogs.segmentfault import SegmentFault
+
+        if not self.interactive:
+            raise AuthInfoRequiredError("没有找到配置文件，需要在终端输入认证信息")
+
+        print("没有找到配置文件，需要输入认证信息来生成配置文件")
+        cookies = input("请输入已登录的简书 cookies：")
+        self._jianshu = Jianshu(parse_cookies(cookies))
+
+        self._cnblogs = input_auth_info_of_cnblogs()
+
+        # TODO: token 好像就是 cookie 中的  PHPSESSIONID
+        cookies = input("请输入思否的 cookies:")
+        token = input("请输入思否的 token:")
+        self._sf = SegmentFault({"cookie": cookies, "token": token})
+
+    def _client(self, attr: str, factory: Callable):
+        client = getattr(self, attr)
+        if client is None:
+            try:
+                client = factory()
+            except (ConfigFileNotFoundError, ConfigFileIsNull, FileNotFoundError):
+                self._input_auth_info()
+                client = getattr(self, attr)
+            setattr(self, attr, client)
+        return client
+
+    # 各平台的模块依赖 requests、xmlrpc 等，在第一次用到客户端时才导入
+    @property
+    def jianshu(self) -> "Jianshu":
+        from mbs.blogs.jianshu import Jianshu
+
+        return self._client("_jianshu", Jianshu)
+
+    @jianshu.setter
+    def jianshu(self, client: "Jianshu"):
+        self._jianshu = client
+
+    @property
+    def cnblogs(self) -> "CnblogsMetaWeblog":
+        from mbs.blogs.cnblogs import CnblogsMetaWeblog
+
+        return self._client("_cnblogs", CnblogsMetaWeblog)
+
+    @property
+    def sf(self) -> "SegmentFault":
+        from mbs.blogs.segmentfault import SegmentFault
+
+        return self._client("_sf", SegmentFault)
+
+    def ensure_categories_synced(self, force: bool = False):
+        """需要平台中的分类 id 的命令执行前同步一次分类，同一个管理器只同步一次
+
+        Args:
+            force (bool, optional): 是否忽略同步结果的有效期，如本地没有找到要使用的分类时
+        """
+        if self._categories_synced and not force:
+            return
         try:
-            self.sync_categories()
+            self.sync_categories(force)
         except CookiesExpiredError:
+            from mbs.blogs.jianshu import Jianshu
+
+            if not self.interactive:
+                # 用 --update-jianshu-cookies 更新配置文件后，下次使用时重新读取
+                self._jianshu = None
+                raise AuthInfoRequiredError("简书 cookies 已过期")
             cookies = input("简书 cookies 过期，请重新在浏览器中登录简书，并将请求头中的新的 Cookies 填写到下面：\n")
             self.jianshu = Jianshu(parse_cookies(cookies))
+            return
+        self._categories_synced = True
 
     def get_categories(self):
         pass
 
     def new_category(self, category_name: str):
+        self.ensure_categories_synced()
         # 简书能创建重名的分类，所以需要先在数据库中做本地判断
         if self.db.category_exists(category_name):
             logger.fatal("分类名 %s 已经存在了，不可重复创建相同分类名" % category_name)
@@ -85,6 +314,8 @@ class AllBlogsManager:
         pass
 
     async def new_post(self, category: str, title: str, content: str, md5: str, file_path: str):
+        self.ensure_categories_synced()
+
         post_record = self.db.select_post(title)
         if post_record:
             logger.warning(f"之前上传过此文章，文章的记录已存在 {post_record}")
@@ -93,6 +324,10 @@ class AllBlogsManager:
                 logger.fatal("所有博客中均有此文章，不能再上传，可以更新此文章")
 
         ids = self.db.select_category(category)
+        if not ids:
+            # 分类可能是上次同步之后在平台中新建的
+            self.ensure_categories_synced(force=True)
+            ids = self.db.select_category(category)
         if not ids:
             logger.fatal("没有此分类：%s" % category)
             sys.exit(1)
@@ -100,13 +335,7 @@ class AllBlogsManager:
         logger.info("正在上传 “%s” ..." % title)
 
         # 提取 tags 需要在删除 yaml 头之前
-        sf_tags_str = self.sf.parse_tags_from_yaml_header(content)
-        logger.debug(f"文章标签：{sf_tags_str}")
-        if sf_tags_str:
-            if len(sf_tags_str) > 5:
-                logger.fatal("思否的标签个数不能超过 5 个")
-        else:
-            sf_tags_str = [category]
+        sf_tags_str = self._sf_tags_of(content, category)
 
         # 删除开头的 yaml 内容
         content = remove_yaml_header(content)
@@ -115,14 +344,14 @@ class AllBlogsManager:
         tasks = []
 
         if post_record:
-            if not jianshu_id:  # type: ignore
+            # 因配额推迟发布的文章由推迟发布队列负责，不重复创建
+            if not jianshu_id and not self.db.is_deferred(title, JIANSHU):  # type: ignore
                 tasks.append(asyncio.create_task(self.jianshu.new_post(ids[1], title, content, self.db)))
             if not cnblogs_id:  # type: ignore
                 post = create_post(title, content, category)
                 tasks.append(asyncio.create_task(self.cnblogs.new_post(post, self.db)))
             if not segment_fault_id:  # type: ignore
-                sf_tags = await self.sf.search_tags(sf_tags_str, self.db)
-                tasks.append(asyncio.create_task(self.sf.new_post(title, content, sf_tags, self.db)))
+                tasks.append(asyncio.create_task(self._new_sf_post(title, content, sf_tags_str)))
         else:
             self.db.insert_post(title, md5, ids[0], file_path=file_path)
 
@@ -131,87 +360,348 @@ class AllBlogsManager:
             post = create_post(title, content, category)
             cnblogs_task = asyncio.create_task(self.cnblogs.new_post(post, self.db))
 
-            sf_tags = await self.sf.search_tags(sf_tags_str, self.db)
-            sf_task = asyncio.create_task(self.sf.new_post(title, content, sf_tags, self.db))
+            sf_task = asyncio.create_task(self._new_sf_post(title, content, sf_tags_str))
 
             tasks = [jianshu_task, cnblogs_task, sf_task]
 
-        await asyncio.gather(*tasks)
+        if not tasks:
+            logger.info(f"《{title}》没有需要新建的平台")
+            return
+
+        results = await _gather(*tasks)
+
+        post_id = self.db.select_post(title)[0]
+        for result in results:
+            if isinstance(result, tuple) and result[1]:
+                fingerprint = _payload_fingerprint(result[0], title, content, category)
+                self.db.record_sync_state(post_id, result[0], fingerprint, SYNC_OK)
+
+        self.finished_posts.append(title)
 
         logger.info(
             "已上传 “%s.md” 到所有博客 - [%s, %s, %s] 的 “%s” 分类中" % (title, self.jianshu, self.cnblogs, self.sf, category)
         )
 
-    async def update_post(self, title: str, content: str, md5: str):
-        # TODO: 更新时应记录每个网站的更新结果，如果某个网站更新失败，可在下次再次更新该网站的文章
+    async def drain_deferred_posts(self):
+        """在配额允许的范围内发布之前被推迟的文章"""
+        today = date.today().isoformat()
+        remaining = JIANSHU_DAILY_POST_LIMIT - self.db.quota_used(JIANSHU, today)
+        if remaining <= 0:
+            return
+
+        rows = self.db.select_due_deferred_posts(JIANSHU, today)
+        if not rows:
+            return
+
+        logger.info(f"正在向{self.jianshu}发布之前被推迟的文章，共 {len(rows)} 篇，今天还可发布 {remaining} 篇")
+        for title, draft_id in rows[:remaining]:
+            category, jianshu_category_id, _ = self.db.query_category_for_post(title)
+            # 推迟期间文章可能被修改过，始终发布文件的当前内容
+            file_path = self.db.select_file_path_of_post(title)
+            content = remove_yaml_header(read_post_from_file(file_path)[1])
+            _, postid = await self.jianshu.new_post(jianshu_category_id, title, content, self.db, draft_id=draft_id)
+            if postid:
+                post_id = self.db.select_post(title)[0]
+                fingerprint = _payload_fingerprint(JIANSHU, title, content, category)
+                self.db.record_sync_state(post_id, JIANSHU, fingerprint, SYNC_OK)
+
+    def _sf_tags_of(self, content: str, category: str) -> List[str]:
+        """从 yaml 头中提取思否标签，没有标签时使用分类名"""
+        sf_tags_str = self.sf.parse_tags_from_yaml_header(content)
+        logger.debug(f"文章标签：{sf_tags_str}")
+        if not sf_tags_str:
+            return [category]
+        if len(sf_tags_str) > 5:
+            logger.fatal("思否的标签个数不能超过 5 个")
+        return sf_tags_str
+
+    async def _new_sf_post(self, title: str, content: str, sf_tags_str: List[str]):
+        # 查询标签与其他平台的上传同时进行
+        sf_tags = await self.sf.search_tags(sf_tags_str, self.db)
+        return await self.sf.new_post(title, content, sf_tags, self.db)
+
+    async def _limited(self, platform: str, func: Callable[[], Awaitable]):
+        """限制同时向同一平台推送的文章数"""
+        async with self._platform_limits.get()[platform]:
+            return await func()
+
+    async def _push_post(
+        self,
+        title: str,
+        content: str,
+        fingerprints: Dict[str, str],
+        platforms: Set[str],
+        jianshu_content: Optional[str] = None,
+        category: Optional[str] = None,
+    ) -> bool:
+        """将文章的新内容推送到指定平台，并记录每个平台的推送结果
+
+        Args:
+            title (str): 文章标题
+            content (str): 删除 yaml 头后的文章内容
+            fingerprints (Dict[str, str]): 平台 => 内容指纹，推送成功时记录到对应平台的状态中
+            platforms (Set[str]): 要推送的平台 key
+            jianshu_content (Optional[str], optional): 已替换过图片链接的简书内容，不传时由简书自己替换
+            category (Optional[str], optional): 文章分类，不传时从数据库中查询
+
+        Returns:
+            bool: 是否所有平台都推送成功
+        """
         post_id, jianshu_id, cnblogs_id, sf_id = self.db.select_post(title)
 
-        logger.info(f"正在更新《{title}》...")
+        logger.info(f"正在更新《{title}》：{sorted(platforms)}")
+
+        tasks: Dict[asyncio.Task, str] = {}
 
         # TODO: 简书更新有问题
-        jianshu_task = asyncio.create_task(self.jianshu.update_post(jianshu_id, content, self.db))
+        if JIANSHU in platforms:
+            if jianshu_content is None:
+                jianshu_task = asyncio.create_task(
+                    self._limited(JIANSHU, lambda: self.jianshu.update_post(jianshu_id, content, self.db))
+                )
+            else:
+                jianshu_task = asyncio.create_task(
+                    self._limited(
+                        JIANSHU,
+                        lambda: self.jianshu.update_post(jianshu_id, jianshu_content, self.db, replace_images=False),
+                    )
+                )
+            tasks[jianshu_task] = JIANSHU
 
-        category = self.db.query_category_for_post(title)[0]
-        post = create_post(title, content, category)
-        cnblogs_task = asyncio.create_task(self.cnblogs.edit_post(cnblogs_id, post))
+        if CNBLOGS in platforms:
+            if not category:
+                category = self.db.query_category_for_post(title)[0]
+            post = create_post(title, content, category)
+            cnblogs_task = asyncio.create_task(self._limited(CNBLOGS, lambda: self.cnblogs.edit_post(cnblogs_id, post)))
+            tasks[cnblogs_task] = CNBLOGS
 
-        if sf_id:
-            sf_task = asyncio.create_task(self.sf.update_post(sf_id, content, self.db, title=title))
-            tasks = [jianshu_task, cnblogs_task, sf_task]
-        else:
-            tasks = [jianshu_task, cnblogs_task]
+        if SEGMENT_FAULT in platforms:
+            sf_task = asyncio.create_task(
+                self._limited(SEGMENT_FAULT, lambda: self.sf.update_post(sf_id, content, self.db, title=title))
+            )
+            tasks[sf_task] = SEGMENT_FAULT
+
+        try:
+            results = await _gather(*tasks)
+        except asyncio.CancelledError:
+            done = [name for task, name in tasks.items() if task.done() and not task.cancelled()]
+            logger.warning(f"《{title}》的更新被取消，已完成的平台：{done}，文章状态未写入数据库，下次运行会重新更新")
+            raise
+
+        all_ok = True
+        for platform, result in zip(tasks.values(), results):
+            if result is True:
+                self.db.record_sync_state(post_id, platform, fingerprints[platform], SYNC_OK)
+            else:
+                all_ok = False
+                error = repr(result) if isinstance(result, BaseException) else "平台返回更新失败"
+                self.db.record_sync_state(post_id, platform, fingerprints[platform], SYNC_FAILED, error)
+                logger.warning(f"《{title}》在 {platform} 中更新失败，下次运行时会重试此平台")
+        return all_ok
+
+    def _is_deferred(self, title: str) -> bool:
+        """文章是否还有平台在推迟发布队列中，此时文章的 md5 不能更新，发布后才会再次对比"""
+        if self.db.is_deferred(title, JIANSHU):
+            logger.info(f"《{title}》在{self.jianshu}中推迟发布，发布后再记录此版本")
+            return True
+        return False
+
+    async def update_post(self, title: str, content: str, md5: str):
+        post_id, jianshu_id, cnblogs_id, sf_id = self.db.select_post(title)
+        content = remove_yaml_header(content)
+        category = self.db.query_category_for_post(title)[0]
+        states = self.db.select_sync_states(post_id)
+        behind, fingerprints = _platforms_behind(
+            _platforms_of_post(jianshu_id, cnblogs_id, sf_id), title, content, category, states
+        )
 
-        await asyncio.gather(*tasks)
+        if not behind:
+            logger.info(f"《{title}》在各平台中的内容没有变化，不需要推送")
+        elif not await self._push_post(title, content, fingerprints, behind, category=category):
+            return
 
+        # 只有所有平台都已是此版本时才更新文章的 md5
+        if self._is_deferred(title):
+            return
         self.db.update_post(title, md5)
+        self.finished_posts.append(title)
 
         logger.info(f"《{title}》更新完成")
 
     async def update_all_posts(self) -> List[str]:
-        from mbs.utils.common import remove_yaml_header
-
         # TODO: 思否发表文章不能太快
         logger.info("正在上传之前上传失败的文章...")
         not_uploaded_posts = self.find_all_not_uploaded_posts()
 
-        count = 0
-        for p in not_uploaded_posts:
-            if count > 0:
-                time.sleep(60)
-                logger.warning("思否创建文章限制在 1篇 / 分，休息 60 秒")
+        await self.drain_deferred_posts()
 
+        pending = []
+        sf_tags: List[str] = []
+        for p in not_uploaded_posts:
             title, jianshu, cnblogs, sf, file_path = p
             category = self.db.select_category_by_title(title, jianshu=jianshu, cnblogs=cnblogs, sf=sf)
             if not category:
                 logger.fatal("没有找到分类：%s" % title)
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            # 不上传曾经上传失败的文章到个人网站中
+            md5, content = hash_file(file_path, with_content=True)
+            pending.append((category, title, content, md5, file_path))
+            if not sf:
+                sf_tags.extend(self._sf_tags_of(content, category))  # type: ignore
 
-            await self.new_post(category, title, content, "", file_path)  # type: ignore
-            count += 1
+        # 所有文章的思否标签去重后一次查询完，逐篇上传时只读本地缓存
+        if sf_tags:
+            await self.sf.resolve_tags(sf_tags, self.db)
+
+        # 思否创建文章的频率由限速调度器控制
+        for category, title, content, md5, file_path in pending:
+            # 不上传曾经上传失败的文章到个人网站中
+            await self.new_post(category, title, content, md5, file_path)  # type: ignore
 
         logger.info("之前上传失败的文章已全部上传")
 
         # 给个人博客更新用的文件集合
         change_files = []
 
-        update_tasks = []
-
-        rows = self.db.select_md5_of_all_posts()
-        for row in rows:
-            id_, title, md5, jianshu_id, cnblogs_id, category_id, sf_id, file_path, _, _ = row
-            current_md5 = get_md5_of_file(file_path)
-            if current_md5 != md5:
-                change_files.append(file_path)
+        # 各平台的同步状态和 stat 缓存在进入流水线之前一次性读出，线程池中的阶段不访问数据库
+        all_states = self.db.select_all_sync_states()
+        stat_cache = StatCache.load(self.db)
+        migrations: List[Tuple[int, Dict[str, str]]] = []
+
+        # 读取并计算指纹在线程池中进行，posts 表中的指纹只在所有平台都推送成功后更新，
+        # 所以文件指纹没变的文章在所有平台都是最新的
+        def hash_post(row) -> Optional[_UpdateJob]:
+            post_id, title, _, jianshu_id, cnblogs_id, sf_id, file_path = row
+            # 需要重新计算指纹的文件，内容来自同一次读取
+            current, content = stat_cache.digest(file_path, keep_content=True)
+            if not _compare_post(row, current, migrations):
+                return None
+            if content is None:
                 content = read_post_from_file(file_path)[1]
-                content = remove_yaml_header(content)
-                update_tasks.append(asyncio.create_task(self.update_post(title, content, current_md5)))
+            return _UpdateJob(
+                post_id, title, file_path, current, content, _platforms_of_post(jianshu_id, cnblogs_id, sf_id)
+            )
 
-        await asyncio.gather(*update_tasks)
+        # 只推送收到的内容会变化的平台，只改了 yaml 头或空白的文章不推送
+        async def preprocess(job: _UpdateJob) -> _UpdateJob:
+            job.content = remove_yaml_header(job.content)
+            job.category = self.db.query_category_for_post(job.title)[0]
+            job.platforms, job.fingerprints = _platforms_behind(
+                job.uploaded_to, job.title, job.content, job.category, all_states.get(job.post_id, {})
+            )
+            return job
+
+        async def upload_images(job: _UpdateJob) -> _UpdateJob:
+            if JIANSHU in job.platforms:
+                job.jianshu_content = await self.jianshu._replace_all_images(job.content, self.db)
+            return job
+
+        async def push(job: _UpdateJob) -> _UpdateJob:
+            if job.platforms:
+                job.pushed = await self._push_post(
+                    job.title, job.content, job.fingerprints, job.platforms, job.jianshu_content, job.category
+                )
+            return job
+
+        async def commit(job: _UpdateJob):
+            change_files.append(job.file_path)
+            if not job.pushed or self._is_deferred(job.title):
+                return
+            self.db.update_post(job.title, job.md5)
+            self.finished_posts.append(job.title)
+            logger.info(f"《{job.title}》更新完成")
+
+        pipeline = (
+            Pipeline(PIPELINE_QUEUE_SIZE)
+            .add_stage("hash", hash_post, PIPELINE_WORKERS["hash"])
+            .add_stage("preprocess", preprocess)
+            .add_stage("images", upload_images, PIPELINE_WORKERS["images"])
+            .add_stage("push", push, PIPELINE_WORKERS["push"])
+            .add_stage("commit", commit)
+        )
+        await pipeline.run(self.db.select_md5_of_all_posts())
+        stat_cache.save(self.db)
+        self._save_migrations(migrations)
 
         return change_files
 
+    async def publish_file(self, file_path: str):
+        """上传或更新一篇文章，文章所在的文件夹名为分类名
+
+        Args:
+            file_path (str): 文章路径
+        """
+        if not os.path.exists(file_path):
+            return
+        title, content, md5 = read_post_and_md5(file_path)
+        post_record = self.db.select_post(title)
+        if post_record:
+            _, jianshu_id, cnblogs_id, sf_id = post_record
+            # 已有此文章的平台推送修改，没有的平台在下面新建
+            if any((jianshu_id, cnblogs_id, sf_id)):
+                await self.update_post(title, content, md5)
+            # 推迟发布的简书文章由推迟发布队列负责
+            if cnblogs_id and sf_id and (jianshu_id or self.db.is_deferred(title, JIANSHU)):
+                return
+
+        category = os.path.basename(os.path.dirname(file_path))
+        self.ensure_categories_synced()
+        if not self.db.category_exists(category):
+            self.ensure_categories_synced(force=True)
+        if not self.db.category_exists(category):
+            logger.warning(f"没有此分类：{category}，跳过《{title}》，请先创建分类")
+            return
+        await self.new_post(category, title, content, md5, file_path)
+
+    async def watch(self, folder: str):
+        """监听文章根目录，只上传或更新发生变化的文章
+
+        所有平台的会话、连接池和限速状态在两次变化之间保持不变。
+
+        Args:
+            folder (str): 文章根目录，子文件夹名为分类名
+        """
+        watcher = FolderWatcher(folder)
+        async for paths in watcher.batches():
+            logger.info(f"检测到 {len(paths)} 篇文章发生变化")
+            for path in sorted(paths):
+                try:
+                    await self.publish_file(path)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"处理 {path} 时出错：{e!r}")
+
+    def _save_migrations(self, migrations: List[Tuple[int, Dict[str, str]]]):
+        if migrations:
+            self.db.migrate_fingerprints(migrations)
+            logger.info(f"已将 {len(migrations)} 篇文章的指纹迁移为 {DEFAULT_ALGORITHM}")
+
+    async def run_with_deadline(self, coro: Awaitable, deadline: Optional[float] = None):
+        """在时限内执行命令，超时后取消所有未完成的平台任务
+
+        已完成的文章在完成时就已写入数据库，超时只会丢弃未完成的部分。
+
+        Args:
+            coro (Awaitable): 要执行的命令
+            deadline (Optional[float], optional): 时限（秒），不传时不限时
+
+        Returns:
+            Any: 命令的返回值，超时时返回 None
+        """
+        # 后台服务中同一个管理器会执行多条命令
+        self.deadline_exceeded = False
+        self.finished_posts = []
+
+        if not deadline:
+            return await coro
+
+        try:
+            return await asyncio.wait_for(coro, deadline)
+        except asyncio.TimeoutError:
+            self.deadline_exceeded = True
+            logger.error(f"超过了 {deadline} 秒的时限，已取消未完成的任务")
+            logger.info(f"时限内已完成的文章（共 {len(self.finished_posts)} 篇）：{self.finished_posts}")
+            return None
+
     def delete_post(self, title: str):
         post = self.db.select_post(title)
         if not post:
@@ -222,39 +712,57 @@ class AllBlogsManager:
         self.cnblogs.delet_post(cnblogs_id)
         logger.info("标题为《%s》的文章已删除" % title)
 
-    def sync_categories(self):
-        # TODO: 改为异步或多线程
-        while True:
-            jcs = self.jianshu.get_categories()
-            ccs = self.cnblogs.get_categories()
-
+    def sync_categories(self, force: bool = False):
+        """同步简书和博客园的分类，并保存两边的分类 id
+
+        同时获取两个平台的分类列表，把只存在于一边的分类并发地在另一边创建，
+        最后在一个事务中写入数据库。距上次同步不足 `CATEGORY_SYNC_TTL` 秒时直接使用数据库中的分类。
+
+        Args:
+            force (bool, optional): 是否忽略上次同步的时间
+        """
+        last_sync = self.db.select_last_sync("categories")
+        if not force and last_sync is not None and time.time() - last_sync < CATEGORY_SYNC_TTL:
+            logger.debug("分类在有效期内，不再同步")
+            return
+
+        # 在主线程中创建客户端，缺少配置文件时需要在终端输入
+        jianshu, cnblogs = self.jianshu, self.cnblogs
+
+        # 博客园的调用都在它自己的线程中依次执行，与简书的请求同时进行
+        with ThreadPoolExecutor(max_workers=CATEGORY_SYNC_WORKERS, thread_name_prefix="mbs-categories") as executor:
+            # 强制同步是为了发现在网站上新建的分类，不能使用缓存的分类列表
+            jianshu_future = executor.submit(jianshu.get_categories, force)
+            cnblogs_future = cnblogs.submit(cnblogs.get_categories, force)
+            jcs, ccs = jianshu_future.result(), cnblogs_future.result()
             if not jcs or not ccs:
                 logger.error("获取分类列表失败")
-                break
-
-            jcs_set = {i["name"] for i in jcs}
-            ccs_set = {i["name"] for i in ccs}
-
-            if jcs_set - ccs_set:
-                for c in jcs_set - ccs_set:
-                    self.cnblogs.new_category(c)
-                logger.info(f"已向博客园添加缺失的分类：{jcs_set - ccs_set}")
-            elif ccs_set - jcs_set:
-                for c in ccs_set - jcs_set:
-                    self.jianshu.new_category(c)
-                logger.info(f"已向简书添加缺失的分类：{ccs_set - jcs_set}")
-            else:
-                logger.info("已同步所有分类")
-                break
-
-        if jcs and ccs:
-            jcs = {i["name"]: i["id"] for i in jcs}
-            ccs = {i["name"]: i["id"] for i in ccs}
-            for k, v in jcs.items():
-                if self.db.select_category(k):
-                    self.db.update_category(k, v, ccs[k])
-                else:
-                    self.db.insert_category(k, v, ccs[k])
+                return
+
+            jianshu_ids: Dict[str, Optional[int]] = {i["name"]: i["id"] for i in jcs}
+            cnblogs_ids: Dict[str, Optional[int]] = {i["name"]: i["id"] for i in ccs}
+
+            created: Dict[Future, Tuple[Dict[str, Optional[int]], str]] = {}
+            for name in jianshu_ids.keys() - cnblogs_ids.keys():
+                created[cnblogs.submit(cnblogs.new_category, name)] = (cnblogs_ids, name)
+            for name in cnblogs_ids.keys() - jianshu_ids.keys():
+                created[executor.submit(jianshu.new_category, name)] = (jianshu_ids, name)
+
+            for future, (ids, name) in created.items():
+                try:
+                    ids[name] = future.result()
+                except Exception as e:
+                    logger.error(f"创建分类 `{name}` 失败：{e!r}")
+                    ids[name] = None
+
+        if created:
+            logger.info(f"已向简书和博客园添加缺失的分类：{sorted(name for _, name in created.values())}")
+
+        categories = {
+            name: (jianshu_ids.get(name), cnblogs_ids.get(name)) for name in jianshu_ids.keys() | cnblogs_ids.keys()
+        }
+        self.db.save_categories(categories)
+        logger.info("已同步所有分类")
 
     def find_all_not_uploaded_posts(self):
         records = self.db.select_all_not_uploaded_posts()
@@ -273,12 +781,39 @@ class AllBlogsManager:
         return not_uploaded_posts
 
     def find_all_changed_markdown_files(self):
+        all_states = self.db.select_all_sync_states()
+        stat_cache = StatCache.load(self.db)
+        rows = self.db.select_md5_of_all_posts()
+        digests = hash_files((row[6] for row in rows), True, hasher=stat_cache.digest)
+        migrations: List[Tuple[int, Dict[str, str]]] = []
         change_files = []
-        for row in self.db.select_md5_of_all_posts():
-            id_, title, md5, _, _, _, _, file_path, _, _ = row
-            current_md5 = get_md5_of_file(file_path)
-            if current_md5 != md5:
-                change_files.append((title, UPDATED_CODE, UPDATED_CODE, UPDATED_CODE, file_path))
+        for row in rows:
+            post_id, title, _, jianshu_id, cnblogs_id, sf_id, file_path = row
+            fingerprint, content = digests[file_path]
+            if not _compare_post(row, fingerprint, migrations):
+                continue
+            if content is None:
+                content = read_post_from_file(file_path)[1]
+            category = self.db.query_category_for_post(title)[0]
+            behind, _ = _platforms_behind(
+                _platforms_of_post(jianshu_id, cnblogs_id, sf_id),
+                title,
+                remove_yaml_header(content),
+                category,
+                all_states.get(post_id, {}),
+            )
+            if behind:
+                change_files.append(
+                    (
+                        title,
+                        UPDATED_CODE if JIANSHU in behind else YES_CODE,
+                        UPDATED_CODE if CNBLOGS in behind else YES_CODE,
+                        UPDATED_CODE if SEGMENT_FAULT in behind else YES_CODE,
+                        file_path,
+                    )
+                )
+        stat_cache.save(self.db)
+        self._save_migrations(migrations)
         if not change_files:
             return None
 
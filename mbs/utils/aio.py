@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: aio.py
+# @Created: 2026-10-18 15:02:44
+# @Modified: 2026-10-18 15:02:44
+
+import asyncio
+
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LoopLocal(Generic[T]):
+    """跟着事件循环走的对象
+
+    每次 asyncio.run 都会创建新的事件循环，Lock、Semaphore、Task 等不能在另一个事件循环中使用。
+    在新的事件循环中第一次使用时用 `factory` 重新创建。
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def get(self) -> T:
+        """获取当前事件循环中的对象，必须在协程中调用"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._value = self._factory()
+            self._loop = loop
+        return self._value  # type: ignore
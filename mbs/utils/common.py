@@ -4,7 +4,7 @@
 # @Email: thepoy@163.com
 # @File Name: common.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-06-05 20:44:31
+# @Modified: 2026-10-18 03:14:01
 
 import sys
 import os
@@ -12,8 +12,9 @@ import os
 if sys.platform == "darwin":
     import readline
 
-import hashlib
-from typing import Tuple, List
+from typing import Tuple
+
+from mbs.utils.hashing import hash_file, hash_files, scan_markdown_files, split_fingerprint
 
 
 def parse_cookies(cookies: str) -> dict:
@@ -34,27 +35,25 @@ def read_post_from_file(file_path: str) -> Tuple[str, str]:
         return title, f.read()
 
 
-def _remove_hidden_folders_or_files(folder_path: str) -> List[str]:
-    return [i for i in os.listdir(folder_path) if not i.startswith(".")]
+def read_post_and_md5(file_path: str) -> Tuple[str, str, str]:
+    """一次读取文件，同时得到文章标题、内容和指纹
 
+    Args:
+        file_path (str): 文件路径
 
-def _get_all_markdown_files(folder_path: str) -> List[str]:
-    files = _remove_hidden_folders_or_files(folder_path)
-    return [i for i in files if i.endswith(".md")]
+    Returns:
+        Tuple[title: str, content: str, fingerprint: str]: 文章标题、内容和文件的指纹
+    """
+    title = os.path.basename(file_path).replace(".md", "")
+    fingerprint, content = hash_file(file_path, with_content=True)
+    return title, content, fingerprint  # type: ignore
 
 
-def get_md5_of_file(file_path, buf: int = 4096) -> str:
-    md5 = hashlib.md5()
-    with open(file_path, "rb") as fb:
-        while True:
-            data = fb.read(buf)
-            if not data:
-                break
-            md5.update(data)
-    return md5.hexdigest()
+def get_md5_of_file(file_path) -> str:
+    return split_fingerprint(hash_file(file_path, algorithm="md5").fingerprint)[1]
 
 
-def scan_folder(folder_path: str) -> dict:
+def scan_folder(folder_path: str, cache=None) -> dict:
     """
     以子文件夹的文件名作为分类名，
     数据库中保存博客中存在的分类，如果本地分类多于数据库中的分类，则在博客中添加多出来的分类。
@@ -62,24 +61,19 @@ def scan_folder(folder_path: str) -> dict:
     扫描时对比所有文件的 md5 与数据库中对应标题的已上传文件的 md5 是否相同，
     不相同则更新文章，相同则不进行任何操作。
     如果数据库中不存在对应标题的文章，直接上传。
+
+    所有文件的指纹在线程池中并发计算，传入 `StatCache` 时，stat 未变化的文件直接使用缓存的指纹。
     """
-    folders = _remove_hidden_folders_or_files(folder_path)
+    folders = scan_markdown_files(folder_path)
+    digests = hash_files((path for paths in folders.values() for path in paths), hasher=cache.digest if cache else None)
     all_files = {}
-    for folder in folders:
-        item = []
-        for file in _get_all_markdown_files(os.path.join(folder_path, folder)):
-            item.append(
-                {
-                    "file_name": file,
-                    "md5": get_md5_of_file(os.path.join(folder_path, folder, file)),
-                }
-            )
-        all_files[folder] = item
+    for folder, paths in folders.items():
+        all_files[folder] = [{"file_name": os.path.basename(path), "md5": digests[path].fingerprint} for path in paths]
     return all_files
 
 
-def find_all_files(folder: str) -> dict:
-    all_files = scan_folder(folder)
+def find_all_files(folder: str, cache=None) -> dict:
+    all_files = scan_folder(folder, cache)
     current_files = {}
     for c, fs in all_files.items():
         for f in fs:
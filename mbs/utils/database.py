@@ -4,14 +4,14 @@
 # @Email: thepoy@163.com
 # @File Name: database.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-06-05 21:01:16
+# @Modified: 2026-10-18 03:22:29
 
 import sqlite3
 import time
 
 from typing import Any, Optional, Tuple, List
 
-from mbs.utils.settings import DATABASE_FILE_PATH
+from mbs.utils.settings import DATABASE_FILE_PATH, ensure_config_folder
 from mbs.utils.logger import child_logger
 
 logger = child_logger(__name__)
@@ -19,6 +19,7 @@ logger = child_logger(__name__)
 
 class DataBase:
     def __init__(self):
+        ensure_config_folder()
         self.conn = sqlite3.connect(DATABASE_FILE_PATH)
         self.cursor = self.conn.cursor()
 
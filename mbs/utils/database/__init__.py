@@ -4,10 +4,10 @@
 # @Email: thepoy@163.com
 # @File Name: __init__.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-07-05 08:10:49
+# @Modified: 2026-10-18 03:32:32
 
 from abc import ABCMeta, abstractstaticmethod
-from typing import List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any
 
 
 class Database(metaclass=ABCMeta):
@@ -49,6 +49,23 @@ class Database(metaclass=ABCMeta):
     ):
         pass
 
+    @abstractstaticmethod
+    def save_categories(self, categories: Dict[str, Tuple[Optional[int], Optional[int]]]):
+        """在一个事务中写入所有分类的 id，并记录同步时间"""
+        pass
+
+    @abstractstaticmethod
+    def select_last_sync(self, name: str) -> Optional[float]:
+        pass
+
+    @abstractstaticmethod
+    def select_sf_tags(self, names: List[str]) -> Dict[str, Tuple[Optional[int], float]]:
+        pass
+
+    @abstractstaticmethod
+    def save_sf_tags(self, tags: Dict[str, Optional[int]]):
+        pass
+
     @abstractstaticmethod
     def query_category_for_post(self, title: str) -> Tuple[str, int, int]:
         pass
@@ -61,6 +78,10 @@ class Database(metaclass=ABCMeta):
     def select_post(self, title: str) -> Tuple[int, int, int, int]:
         pass
 
+    @abstractstaticmethod
+    def select_file_path_of_post(self, title: str) -> Optional[str]:
+        pass
+
     @abstractstaticmethod
     def update_post(self, title: str, md5: str):
         pass
@@ -70,7 +91,7 @@ class Database(metaclass=ABCMeta):
         pass
 
     @abstractstaticmethod
-    def select_md5_of_all_posts(self) -> List[Any]:
+    def select_md5_of_all_posts(self) -> List[Tuple[int, str, str, int, int, int, str]]:
         pass
 
     @abstractstaticmethod
@@ -96,6 +117,18 @@ class Database(metaclass=ABCMeta):
     ):
         pass
 
+    @abstractstaticmethod
+    def select_jianshu_note(self, note_id: int) -> Optional[Tuple[int, str, int]]:
+        pass
+
+    @abstractstaticmethod
+    def save_jianshu_note(self, note_id: int, notebook_id: int, title: str, version: int):
+        pass
+
+    @abstractstaticmethod
+    def select_jianshu_notebook_of_post(self, note_id: int) -> Optional[int]:
+        pass
+
     @abstractstaticmethod
     def uploaded(self, raw_url: str, jianshu_url: str):
         pass
@@ -104,6 +137,83 @@ class Database(metaclass=ABCMeta):
     def is_uploaded(self, raw_url: str) -> Optional[str]:
         pass
 
+    @abstractstaticmethod
+    def select_image_url(self, digest: str, platform: str) -> Optional[str]:
+        pass
+
+    @abstractstaticmethod
+    def save_image_url(self, digest: str, platform: str, url: str):
+        pass
+
+    @abstractstaticmethod
+    def select_image_digest(self, source: str) -> Optional[str]:
+        pass
+
+    @abstractstaticmethod
+    def save_image_digest(self, source: str, digest: str):
+        pass
+
+    @abstractstaticmethod
+    def defer_post(
+        self,
+        title: str,
+        platform: str,
+        not_before: str,
+        draft_id: Optional[int] = None,
+        reason: Optional[str] = None,
+    ):
+        pass
+
+    @abstractstaticmethod
+    def select_due_deferred_posts(self, platform: str, today: str) -> List[Tuple[str, Optional[int]]]:
+        pass
+
+    @abstractstaticmethod
+    def is_deferred(self, title: str, platform: str) -> bool:
+        pass
+
+    @abstractstaticmethod
+    def remove_deferred_post(self, title: str, platform: str):
+        pass
+
+    @abstractstaticmethod
+    def quota_used(self, platform: str, day: str) -> int:
+        pass
+
+    @abstractstaticmethod
+    def use_quota(self, platform: str, day: str, amount: int = 1):
+        pass
+
+    @abstractstaticmethod
+    def record_sync_state(
+        self, post_id: int, platform: str, content_hash: str, status: str, error: Optional[str] = None
+    ):
+        pass
+
+    @abstractstaticmethod
+    def select_sync_states(self, post_id: int) -> Dict[str, Optional[str]]:
+        pass
+
+    @abstractstaticmethod
+    def select_all_sync_states(self) -> Dict[int, Dict[str, Optional[str]]]:
+        pass
+
+    @abstractstaticmethod
+    def select_all_file_stats(self) -> Dict[str, Tuple[Tuple[int, int, int], str]]:
+        pass
+
+    @abstractstaticmethod
+    def select_file_stats(self, paths: List[str]) -> Dict[str, Tuple[Tuple[int, int, int], str]]:
+        pass
+
+    @abstractstaticmethod
+    def save_file_stats(self, stats: Dict[str, Tuple[int, int, int, str]]):
+        pass
+
+    @abstractstaticmethod
+    def migrate_fingerprints(self, migrations: List[Tuple[int, Dict[str, str]]]):
+        pass
+
     @abstractstaticmethod
     def execute(self, sql: str, *args):
         pass
@@ -4,14 +4,14 @@
 # @Email: thepoy@163.com
 # @File Name: sqlite.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-07-24 14:43:18
+# @Modified: 2026-10-18 03:33:21
 
 import sqlite3
 import time
 
-from typing import Any, Optional, Tuple, List
+from typing import Any, Dict, Optional, Tuple, List
 
-from mbs.utils.settings import DATABASE_FILE_PATH
+from mbs.utils.settings import DATABASE_FILE_PATH, SYNC_OK, ensure_config_folder
 from mbs.utils.logger import child_logger
 
 logger = child_logger(__name__)
@@ -19,6 +19,7 @@ logger = child_logger(__name__)
 
 class DataBase:
     def __init__(self):
+        ensure_config_folder()
         self.conn = sqlite3.connect(DATABASE_FILE_PATH)
         self.cursor = self.conn.cursor()
 
@@ -65,6 +66,112 @@ class DataBase:
         """
         self.execute(sql)
 
+        # 因平台配额（如简书每天最多发布 2 篇）被推迟发布的文章
+        sql = """
+        CREATE TABLE IF NOT EXISTS `deferred_posts` (
+            id INTEGER PRIMARY key NOT NULL,
+            title VARCHAR NOT NULL,
+            platform VARCHAR NOT NULL,
+            draft_id INTEGER DEFAULT NULL,
+            reason VARCHAR DEFAULT NULL,
+            not_before DATE NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            create_time DATETIME DEFAULT NULL,
+            UNIQUE (title, platform)
+        );
+        """
+        self.execute(sql)
+
+        # 各平台每天已使用的发布配额
+        sql = """
+        CREATE TABLE IF NOT EXISTS `daily_quota` (
+            platform VARCHAR NOT NULL,
+            day DATE NOT NULL,
+            used INTEGER NOT NULL DEFAULT 0,
+            PRIMARY key (platform, day)
+        );
+        """
+        self.execute(sql)
+
+        # 文章在各平台的同步状态，部分平台更新失败时只重试失败的平台
+        sql = """
+        CREATE TABLE IF NOT EXISTS `post_sync_state` (
+            post_id INTEGER NOT NULL,
+            platform VARCHAR NOT NULL,
+            content_hash VARCHAR DEFAULT NULL,
+            status VARCHAR NOT NULL,
+            error VARCHAR DEFAULT NULL,
+            update_time DATETIME DEFAULT NULL,
+            PRIMARY key (post_id, platform),
+            FOREIGN key (post_id) REFERENCES posts(id)
+        );
+        """
+        self.execute(sql)
+
+        # 文件的 stat 与 md5，stat 未变化的文件不再重新计算 md5
+        sql = """
+        CREATE TABLE IF NOT EXISTS `file_stats` (
+            file_path VARCHAR(256) PRIMARY key NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            inode INTEGER NOT NULL,
+            md5 VARCHAR NOT NULL
+        );
+        """
+        self.execute(sql)
+
+        # 简书文章所在的文集、标题和最后一次保存时使用的版本号（autosave_control），
+        # 更新文章时不必再下载整个文集的文章列表
+        sql = """
+        CREATE TABLE IF NOT EXISTS `jianshu_notes` (
+            note_id INTEGER PRIMARY key NOT NULL,
+            notebook_id INTEGER NOT NULL,
+            title VARCHAR NOT NULL,
+            version INTEGER NOT NULL,
+            update_time DATETIME DEFAULT NULL
+        );
+        """
+        self.execute(sql)
+
+        # 定期同步的数据（如分类）最后一次同步的时间戳
+        sql = """
+        CREATE TABLE IF NOT EXISTS `last_sync` (
+            name VARCHAR PRIMARY key NOT NULL,
+            sync_time REAL NOT NULL
+        );
+        """
+        self.execute(sql)
+
+        # 按内容指纹记录图片在各平台图床中的链接，同一张图片在每个平台只上传一次
+        sql = """
+        CREATE TABLE IF NOT EXISTS `image_urls` (
+            digest VARCHAR NOT NULL,
+            platform VARCHAR NOT NULL,
+            url VARCHAR NOT NULL,
+            PRIMARY key (digest, platform)
+        );
+        """
+        self.execute(sql)
+
+        # 远程图片链接对应的内容指纹，每个链接只下载一次
+        sql = """
+        CREATE TABLE IF NOT EXISTS `image_sources` (
+            source VARCHAR PRIMARY key NOT NULL,
+            digest VARCHAR NOT NULL
+        );
+        """
+        self.execute(sql)
+
+        # 思否标签名对应的标签 id，sf_id 为 NULL 表示思否中没有此标签
+        sql = """
+        CREATE TABLE IF NOT EXISTS `sf_tags` (
+            name VARCHAR PRIMARY key NOT NULL,
+            sf_id INTEGER DEFAULT NULL,
+            sync_time REAL NOT NULL
+        );
+        """
+        self.execute(sql)
+
         self.commit()
 
     def get_categories(self) -> List[str]:
@@ -165,6 +272,66 @@ class DataBase:
         self.execute(sql)
         self.commit()
 
+    def save_categories(self, categories: Dict[str, Tuple[Optional[int], Optional[int]]]):
+        """在一个事务中写入所有分类在简书和博客园的 id，并记录同步时间
+
+        Args:
+            categories (Dict[str, Tuple[Optional[int], Optional[int]]]): 分类名 => (简书分类 id, 博客园分类 id)，
+                为 None 的 id 保留数据库中原有的值
+        """
+        sql = (
+            "INSERT INTO `categories` (category, jianshu_id, cnblogs_id) VALUES (?, ?, ?) ON CONFLICT (category) DO"
+            " UPDATE SET jianshu_id = COALESCE(excluded.jianshu_id, jianshu_id), cnblogs_id ="
+            " COALESCE(excluded.cnblogs_id, cnblogs_id);"
+        )
+        for category, (jianshu_id, cnblogs_id) in categories.items():
+            try:
+                self.execute(sql, category, jianshu_id, cnblogs_id)
+            except sqlite3.IntegrityError:
+                # 平台中的分类被改名后，旧分类名仍占用着这个 id，只跳过这一条
+                logger.warning(f"分类 `{category}` 的 id 与数据库中的其他分类重复，未更新")
+        self.execute("INSERT OR REPLACE INTO `last_sync` (name, sync_time) VALUES (?, ?);", "categories", time.time())
+        self.commit()
+
+    def select_last_sync(self, name: str) -> Optional[float]:
+        row = self.execute("SELECT sync_time FROM `last_sync` WHERE name = ?;", name).fetchone()
+        return row[0] if row else None
+
+    def select_sf_tags(self, names: List[str]) -> Dict[str, Tuple[Optional[int], float]]:
+        """查询多个思否标签的缓存
+
+        Args:
+            names (List[str]): 标签名列表
+
+        Returns:
+            Dict[str, Tuple[Optional[int], float]]: 标签名 => (标签 id, 查询时间戳)，没有缓存的标签不在其中
+        """
+        if not names:
+            return {}
+        sql = "SELECT name, sf_id, sync_time FROM `sf_tags` WHERE name IN (%s);" % ", ".join("?" * len(names))
+        return {row[0]: (row[1], row[2]) for row in self.execute(sql, *names).fetchall()}
+
+    def save_sf_tags(self, tags: Dict[str, Optional[int]]):
+        """在一个事务中写入多个思否标签的查询结果
+
+        与标签同名的分类同时更新 `segment_fault_id` 字段。
+
+        Args:
+            tags (Dict[str, Optional[int]]): 标签名 => 标签 id，为 None 表示思否中没有此标签
+        """
+        now = time.time()
+        sql = (
+            "INSERT INTO `sf_tags` (name, sf_id, sync_time) VALUES (?, ?, ?) ON CONFLICT (name) DO UPDATE SET"
+            " sf_id = excluded.sf_id, sync_time = excluded.sync_time;"
+        )
+        logger.debug(f"写入 {len(tags)} 个思否标签")
+        self.cursor.executemany(sql, [(name, sf_id, now) for name, sf_id in tags.items()])
+        self.cursor.executemany(
+            "UPDATE OR IGNORE `categories` SET segment_fault_id = ? WHERE category = ?;",
+            [(sf_id, name) for name, sf_id in tags.items() if sf_id],
+        )
+        self.commit()
+
     def query_category_for_post(self, title: str) -> Tuple[str, int, int]:
         sql = (
             "SELECT c.category, c.jianshu_id, c.cnblogs_id FROM categories c WHERE c.id = (SELECT p.category_id FROM"
@@ -183,6 +350,11 @@ class DataBase:
         row = self.execute(sql).fetchone()
         return row
 
+    def select_file_path_of_post(self, title: str) -> Optional[str]:
+        sql = "SELECT file_path FROM posts WHERE title = ?"
+        row = self.execute(sql, title).fetchone()
+        return row[0] if row else None
+
     def update_post(self, title: str, md5: str):
         now = time.localtime()
         update_time = time.strftime("%Y-%m-%d %H:%M:%S", now)
@@ -200,8 +372,8 @@ class DataBase:
         rows = self.execute(sql).fetchall()
         return rows
 
-    def select_md5_of_all_posts(self) -> List[Any]:
-        sql = "SELECT * FROM posts"
+    def select_md5_of_all_posts(self) -> List[Tuple[int, str, str, int, int, int, str]]:
+        sql = "SELECT id, title, md5, jianshu_id, cnblogs_id, segment_fault_id, file_path FROM posts"
         rows = self.execute(sql).fetchall()
         return rows
 
@@ -253,6 +425,38 @@ class DataBase:
         self.execute(sql)
         self.commit()
 
+    def select_jianshu_note(self, note_id: int) -> Optional[Tuple[int, str, int]]:
+        """查询简书文章的文集 id、标题和版本号"""
+        sql = "SELECT notebook_id, title, version FROM `jianshu_notes` WHERE note_id = ?;"
+        return self.execute(sql, note_id).fetchone()
+
+    def save_jianshu_note(self, note_id: int, notebook_id: int, title: str, version: int):
+        """记录简书文章保存成功后的版本号
+
+        Args:
+            note_id (int): 简书文章 id
+            notebook_id (int): 文集 id
+            title (str): 文章标题
+            version (int): 本次保存时使用的 autosave_control
+        """
+        update_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        sql = (
+            "INSERT INTO `jianshu_notes` (note_id, notebook_id, title, version, update_time) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (note_id) DO UPDATE SET notebook_id = excluded.notebook_id, title = excluded.title,"
+            " version = excluded.version, update_time = excluded.update_time;"
+        )
+        self.execute(sql, note_id, notebook_id, title, version, update_time)
+        self.commit()
+
+    def select_jianshu_notebook_of_post(self, note_id: int) -> Optional[int]:
+        """从文章的分类查询简书文章所在的文集 id"""
+        sql = (
+            "SELECT c.jianshu_id FROM categories as c WHERE c.id = (SELECT p.category_id FROM posts p WHERE"
+            " p.jianshu_id = ?);"
+        )
+        row = self.execute(sql, note_id).fetchone()
+        return row[0] if row else None
+
     def uploaded(self, raw_url: str, jianshu_url: str):
         """将上传成功的图片原链接和新链接保存起来
 
@@ -260,7 +464,8 @@ class DataBase:
             raw_url (str): 原链接 / 外链
             jianshu_url (str): 简书图床中的链接
         """
-        sql = "INSERT INTO `uploaded_images` VALUES (NULL, ?, ?)"
+        # 同一张图片可能被同时更新的多篇文章上传过，已有记录时保留原来的链接
+        sql = "INSERT OR IGNORE INTO `uploaded_images` VALUES (NULL, ?, ?)"
         self.execute(sql, raw_url, jianshu_url)
         self.commit()
 
@@ -280,6 +485,206 @@ class DataBase:
             return None
         return row[0]
 
+    def select_image_url(self, digest: str, platform: str) -> Optional[str]:
+        """查询内容指纹为 digest 的图片在平台图床中的链接"""
+        sql = "SELECT url FROM `image_urls` WHERE digest = ? AND platform = ?;"
+        row = self.execute(sql, digest, platform).fetchone()
+        return row[0] if row else None
+
+    def save_image_url(self, digest: str, platform: str, url: str):
+        """记录图片上传到平台图床后的链接
+
+        Args:
+            digest (str): 图片内容的指纹
+            platform (str): 平台的 key
+            url (str): 图床中的链接
+        """
+        sql = (
+            "INSERT INTO `image_urls` (digest, platform, url) VALUES (?, ?, ?) ON CONFLICT (digest, platform) DO"
+            " UPDATE SET url = excluded.url;"
+        )
+        self.execute(sql, digest, platform, url)
+        self.commit()
+
+    def select_image_digest(self, source: str) -> Optional[str]:
+        """查询远程图片链接对应的内容指纹"""
+        row = self.execute("SELECT digest FROM `image_sources` WHERE source = ?;", source).fetchone()
+        return row[0] if row else None
+
+    def save_image_digest(self, source: str, digest: str):
+        sql = "INSERT OR REPLACE INTO `image_sources` (source, digest) VALUES (?, ?);"
+        self.execute(sql, source, digest)
+        self.commit()
+
+    def defer_post(
+        self,
+        title: str,
+        platform: str,
+        not_before: str,
+        draft_id: Optional[int] = None,
+        reason: Optional[str] = None,
+    ):
+        """将文章加入推迟发布队列，已在队列中时更新最早发布日期并增加尝试次数
+
+        Args:
+            title (str): 文章标题
+            platform (str): 平台的 key
+            not_before (str): 最早的发布日期，格式为 `%Y-%m-%d`
+            draft_id (Optional[int], optional): 平台中已创建的草稿 id，发布时直接使用，不再重复创建
+            reason (Optional[str], optional): 推迟的原因
+        """
+        now = time.localtime()
+        create_time = time.strftime("%Y-%m-%d %H:%M:%S", now)
+        sql = (
+            "INSERT INTO `deferred_posts` (title, platform, draft_id, reason, not_before, create_time) VALUES (?, ?, ?,"
+            " ?, ?, ?) ON CONFLICT (title, platform) DO UPDATE SET draft_id = COALESCE(excluded.draft_id, draft_id),"
+            " reason = excluded.reason, not_before = excluded.not_before, attempts = attempts + 1;"
+        )
+        self.execute(sql, title, platform, draft_id, reason, not_before, create_time)
+        self.commit()
+
+    def select_due_deferred_posts(self, platform: str, today: str) -> List[Tuple[str, Optional[int]]]:
+        """查询到期的推迟发布的文章，按加入队列的先后排序
+
+        Args:
+            platform (str): 平台的 key
+            today (str): 当天日期，格式为 `%Y-%m-%d`
+
+        Returns:
+            List[Tuple[str, Optional[int]]]: (标题, 草稿 id) 列表
+        """
+        sql = "SELECT title, draft_id FROM `deferred_posts` WHERE platform = ? AND not_before <= ? ORDER BY id;"
+        return self.execute(sql, platform, today).fetchall()
+
+    def is_deferred(self, title: str, platform: str) -> bool:
+        sql = "SELECT 1 FROM `deferred_posts` WHERE title = ? AND platform = ?;"
+        return bool(self.execute(sql, title, platform).fetchone())
+
+    def remove_deferred_post(self, title: str, platform: str):
+        sql = "DELETE FROM `deferred_posts` WHERE title = ? AND platform = ?;"
+        self.execute(sql, title, platform)
+        self.commit()
+
+    def quota_used(self, platform: str, day: str) -> int:
+        sql = "SELECT used FROM `daily_quota` WHERE platform = ? AND day = ?;"
+        row = self.execute(sql, platform, day).fetchone()
+        return row[0] if row else 0
+
+    def use_quota(self, platform: str, day: str, amount: int = 1):
+        """记录平台当天使用的发布配额
+
+        Args:
+            platform (str): 平台的 key
+            day (str): 日期，格式为 `%Y-%m-%d`
+            amount (int, optional): 使用的配额数
+        """
+        sql = (
+            "INSERT INTO `daily_quota` (platform, day, used) VALUES (?, ?, ?) ON CONFLICT (platform, day) DO UPDATE"
+            " SET used = used + excluded.used;"
+        )
+        self.execute(sql, platform, day, amount)
+        self.commit()
+
+    def record_sync_state(
+        self, post_id: int, platform: str, content_hash: str, status: str, error: Optional[str] = None
+    ):
+        """记录文章在某个平台的同步结果
+
+        失败时保留上一次成功同步的 hash，这样下次运行仍能判断出该平台落后于本地文件。
+
+        Args:
+            post_id (int): 文章 id
+            platform (str): 平台的 key
+            content_hash (str): 本次推送的文章 hash
+            status (str): 同步状态
+            error (Optional[str], optional): 失败原因
+        """
+        now = time.localtime()
+        update_time = time.strftime("%Y-%m-%d %H:%M:%S", now)
+        sql = (
+            "INSERT INTO `post_sync_state` (post_id, platform, content_hash, status, error, update_time) VALUES (?, ?,"
+            " ?, ?, ?, ?) ON CONFLICT (post_id, platform) DO UPDATE SET content_hash = COALESCE(excluded.content_hash,"
+            " content_hash), status = excluded.status, error = excluded.error, update_time = excluded.update_time;"
+        )
+        synced_hash = content_hash if status == SYNC_OK else None
+        self.execute(sql, post_id, platform, synced_hash, status, error, update_time)
+        self.commit()
+
+    def select_sync_states(self, post_id: int) -> Dict[str, Optional[str]]:
+        """查询文章在各平台最后一次同步成功的 hash
+
+        Args:
+            post_id (int): 文章 id
+
+        Returns:
+            Dict[str, Optional[str]]: 平台 => hash，从未同步成功的平台为 None
+        """
+        sql = "SELECT platform, content_hash FROM `post_sync_state` WHERE post_id = ?;"
+        return dict(self.execute(sql, post_id).fetchall())
+
+    def select_all_sync_states(self) -> Dict[int, Dict[str, Optional[str]]]:
+        """查询所有文章的同步状态
+
+        Returns:
+            Dict[int, Dict[str, Optional[str]]]: 文章 id => {平台 => hash}
+        """
+        states: Dict[int, Dict[str, Optional[str]]] = {}
+        for post_id, platform, content_hash in self.execute(
+            "SELECT post_id, platform, content_hash FROM `post_sync_state`;"
+        ).fetchall():
+            states.setdefault(post_id, {})[platform] = content_hash
+        return states
+
+    def select_all_file_stats(self) -> Dict[str, Tuple[Tuple[int, int, int], str]]:
+        """查询所有文件的 stat 缓存
+
+        Returns:
+            Dict[str, Tuple[Tuple[int, int, int], str]]: 文件路径 => ((size, mtime_ns, inode), md5)
+        """
+        sql = "SELECT file_path, size, mtime_ns, inode, md5 FROM `file_stats`;"
+        return {row[0]: (tuple(row[1:4]), row[4]) for row in self.execute(sql).fetchall()}
+
+    def select_file_stats(self, paths: List[str]) -> Dict[str, Tuple[Tuple[int, int, int], str]]:
+        """查询部分文件的 stat 缓存，返回值与 `select_all_file_stats` 相同"""
+        if not paths:
+            return {}
+        sql = "SELECT file_path, size, mtime_ns, inode, md5 FROM `file_stats` WHERE file_path IN (%s);" % ", ".join(
+            "?" * len(paths)
+        )
+        return {row[0]: (tuple(row[1:4]), row[4]) for row in self.execute(sql, *paths).fetchall()}
+
+    def save_file_stats(self, stats: Dict[str, Tuple[int, int, int, str]]):
+        """在一个事务中写入多个文件的 stat 缓存
+
+        Args:
+            stats (Dict[str, Tuple[int, int, int, str]]): 文件路径 => (size, mtime_ns, inode, md5)
+        """
+        sql = (
+            "INSERT INTO `file_stats` (file_path, size, mtime_ns, inode, md5) VALUES (?, ?, ?, ?, ?) ON CONFLICT"
+            " (file_path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, inode = excluded.inode,"
+            " md5 = excluded.md5;"
+        )
+        logger.debug(f"写入 {len(stats)} 个文件的 stat 缓存")
+        self.cursor.executemany(sql, [(path, *row) for path, row in stats.items()])
+        self.commit()
+
+    def migrate_fingerprints(self, migrations: List[Tuple[int, Dict[str, str]]]):
+        """在一个事务中将文章和同步状态中的旧指纹替换为新算法计算的指纹
+
+        Args:
+            migrations (List[Tuple[int, Dict[str, str]]]): (文章 id, {旧指纹 => 新指纹}) 列表
+        """
+        for post_id, fingerprints in migrations:
+            for old, new in fingerprints.items():
+                self.execute("UPDATE `posts` SET md5 = ? WHERE id = ? AND md5 = ?;", new, post_id, old)
+                self.execute(
+                    "UPDATE `post_sync_state` SET content_hash = ? WHERE post_id = ? AND content_hash = ?;",
+                    new,
+                    post_id,
+                    old,
+                )
+        self.commit()
+
     def execute(self, sql: str, *args):
         if args:
             spilts = sql.split("?")
@@ -4,7 +4,7 @@
 # @Email: thepoy@163.com
 # @File Name: exceptions.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-06-20 08:33:45
+# @Modified: 2026-10-18 03:54:19
 
 
 class ConfigFileNotFoundError(Exception):
@@ -17,3 +17,23 @@ class ConfigFileIsNull(Exception):
 
 class CookiesExpiredError(Exception):
     pass
+
+
+class AuthInfoRequiredError(Exception):
+    """需要在终端输入认证信息，但当前不能交互（如在后台服务中）"""
+
+    pass
+
+
+class DailyQuotaExceededError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class VersionConflictError(Exception):
+    """保存简书文章时使用的版本号已过期"""
+
+    pass
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: filecache.py
+# @Created: 2026-10-18 10:21:06
+# @Modified: 2026-10-18 03:14:01
+
+import os
+import time
+import threading
+
+from typing import Dict, Optional, Tuple
+
+from mbs.utils.hashing import DEFAULT_ALGORITHM, FileDigest, fingerprint_algorithm, hash_file
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+# (文件大小, 修改时间 ns, inode)
+FileStat = Tuple[int, int, int]
+
+# 修改时间距今不足此秒数的文件不缓存：同一时间精度内再次修改的文件 stat 可能不变
+RACY_WINDOW = 2
+
+
+def stat_key(st: os.stat_result) -> FileStat:
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class StatCache:
+    """基于文件 stat 的指纹缓存
+
+    文件的 (size, mtime_ns, inode) 与缓存中的相同、且缓存的指纹是当前算法计算的时，直接使用缓存的指纹，不再读取文件。
+
+    缓存在主线程中从数据库一次性读出，`md5` 可以在线程池中调用，
+    新计算的结果暂存在内存中，由 `save` 在主线程中一次写回数据库。
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Tuple[FileStat, str]]] = None):
+        """初始化函数
+
+        Args:
+            entries (Optional[Dict[str, Tuple[FileStat, str]]], optional): 文件路径 => (stat, 指纹)
+        """
+        self._entries = entries or {}
+        self._dirty: Dict[str, Tuple[FileStat, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, db) -> "StatCache":
+        return cls(db.select_all_file_stats())
+
+    def digest(self, file_path: str, keep_content: bool = False) -> FileDigest:
+        """获取文件的指纹，stat 未变化时不读取文件
+
+        Args:
+            file_path (str): 文件路径
+            keep_content (bool, optional): 需要读取文件时是否同时返回文件内容，缓存命中时内容为 None
+
+        Returns:
+            FileDigest: 指纹和内容
+        """
+        st = os.stat(file_path)
+        key = stat_key(st)
+        cached = self._entries.get(file_path)
+        if cached and cached[0] == key and fingerprint_algorithm(cached[1]) == DEFAULT_ALGORITHM:
+            with self._lock:
+                self.hits += 1
+            return FileDigest(cached[1])
+
+        digest = hash_file(file_path, keep_content)
+        with self._lock:
+            self.misses += 1
+            if time.time() - st.st_mtime > RACY_WINDOW:
+                self._entries[file_path] = self._dirty[file_path] = (key, digest.fingerprint)
+        return digest
+
+    def fingerprint(self, file_path: str) -> str:
+        return self.digest(file_path).fingerprint
+
+    def save(self, db):
+        """将新计算的指纹写回数据库"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if dirty:
+            db.save_file_stats({path: (*st, md5) for path, (st, md5) in dirty.items()})
+        logger.debug(f"stat 缓存命中 {self.hits} 个文件，重新计算 {self.misses} 个文件的指纹")
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: hashing.py
+# @Created: 2026-10-18 10:52:13
+# @Modified: 2026-10-18 03:45:03
+
+import os
+import mmap
+import hashlib
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from mbs.utils.settings import HASH_WORKERS, HASH_MMAP_THRESHOLD, FINGERPRINT_ALGORITHM
+from mbs.utils.logger import child_logger
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+logger = child_logger(__name__)
+
+# 算法名 => 创建 hash 对象的函数，指纹的格式为 `算法名:十六进制摘要`
+_ALGORITHMS: Dict[str, Callable] = {
+    "md5": hashlib.md5,
+    "blake2b": lambda: hashlib.blake2b(digest_size=16),
+}
+if xxhash is not None:
+    _ALGORITHMS["xxh3"] = xxhash.xxh3_128
+
+# 没有算法名前缀的旧数据都是 md5
+LEGACY_ALGORITHM = "md5"
+
+
+def _default_algorithm() -> str:
+    if FINGERPRINT_ALGORITHM in _ALGORITHMS:
+        return FINGERPRINT_ALGORITHM
+    logger.warning(f"不支持的指纹算法 `{FINGERPRINT_ALGORITHM}`（xxh3 需要安装 xxhash），使用 blake2b")
+    return "blake2b"
+
+
+DEFAULT_ALGORITHM = _default_algorithm()
+
+
+def split_fingerprint(fingerprint: str) -> Tuple[str, str]:
+    """拆分指纹
+
+    Args:
+        fingerprint (str): 带算法名前缀的指纹，或没有前缀的旧 md5
+
+    Returns:
+        Tuple[str, str]: 算法名和十六进制摘要
+    """
+    algorithm, sep, digest = fingerprint.partition(":")
+    if not sep:
+        return LEGACY_ALGORITHM, fingerprint
+    return algorithm, digest
+
+
+def fingerprint_algorithm(fingerprint: str) -> str:
+    return split_fingerprint(fingerprint)[0]
+
+
+def same_fingerprint(a: Optional[str], b: Optional[str]) -> bool:
+    """比较两个指纹，旧的无前缀 md5 与 `md5:` 前缀的 md5 视为相同"""
+    if a is None or b is None:
+        return a is b
+    return split_fingerprint(a) == split_fingerprint(b)
+
+
+def supports_algorithm(algorithm: str) -> bool:
+    return algorithm in _ALGORITHMS
+
+
+def available_algorithms() -> List[str]:
+    """当前环境中可用的指纹算法，xxh3 需要安装 xxhash"""
+    return list(_ALGORITHMS)
+
+
+def normalize_text(text: str) -> str:
+    """统一换行并去掉行尾空白和末尾空行，只改变这些的内容得到相同的指纹"""
+    return "\n".join(line.rstrip() for line in text.splitlines()).rstrip("\n")
+
+
+def fingerprint_text(*parts: str, algorithm: Optional[str] = None) -> str:
+    """计算多段文本规范化后的指纹
+
+    Args:
+        parts (str): 文本，如标题、分类、内容
+        algorithm (Optional[str], optional): 指纹算法，默认为配置的算法
+
+    Returns:
+        str: 带算法名前缀的指纹
+    """
+    algorithm = algorithm or DEFAULT_ALGORITHM
+    hasher = _ALGORITHMS[algorithm]()
+    for part in parts:
+        hasher.update(normalize_text(part).encode("utf-8"))
+        hasher.update(b"\0")
+    return f"{algorithm}:{hasher.hexdigest()}"
+
+
+class FileDigest(NamedTuple):
+    """文件的指纹，需要时附带解码后的内容"""
+
+    fingerprint: str
+    content: Optional[str] = None
+
+
+def fingerprint_bytes(data: bytes, algorithm: Optional[str] = None) -> str:
+    """计算二进制内容（如图片）的指纹，不做任何规范化"""
+    algorithm = algorithm or DEFAULT_ALGORITHM
+    hasher = _ALGORITHMS[algorithm]()
+    hasher.update(data)
+    return f"{algorithm}:{hasher.hexdigest()}"
+
+
+def hash_file(file_path: str, with_content: bool = False, algorithm: Optional[str] = None) -> FileDigest:
+    """一次读取文件，同时得到指纹和内容
+
+    小文件一次 read 读完，只需要指纹的大文件用 mmap 交给 hash 函数，不复制到 Python 对象中。
+
+    Args:
+        file_path (str): 文件路径
+        with_content (bool, optional): 是否返回按 utf-8 解码的内容，换行与文本模式读取的一致
+        algorithm (Optional[str], optional): 指纹算法，默认为配置的算法
+
+    Returns:
+        FileDigest: 指纹和内容
+    """
+    algorithm = algorithm or DEFAULT_ALGORITHM
+    hasher = _ALGORITHMS[algorithm]()
+    with open(file_path, "rb") as fb:
+        size = os.fstat(fb.fileno()).st_size
+        if not with_content and size >= HASH_MMAP_THRESHOLD:
+            with mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                hasher.update(mm)
+                return FileDigest(f"{algorithm}:{hasher.hexdigest()}")
+        data = fb.read()
+    hasher.update(data)
+    return FileDigest(f"{algorithm}:{hasher.hexdigest()}", _decode(data) if with_content else None)
+
+
+def migrate_fingerprints(file_path: str, current: str, stored: Iterable[Optional[str]]) -> Dict[str, str]:
+    """找出用其他算法记录、但与文件当前内容一致的旧指纹
+
+    每种旧算法只计算一次，这样更换算法后未修改的文章不会被当成已修改而重新上传。
+
+    Args:
+        file_path (str): 文件路径
+        current (str): 用当前算法计算的指纹
+        stored (Iterable[Optional[str]]): 数据库中记录的指纹
+
+    Returns:
+        Dict[str, str]: 旧指纹 => 当前指纹，只包含与文件内容一致的旧指纹
+    """
+    algorithm = fingerprint_algorithm(current)
+    computed: Dict[str, str] = {}
+    migrated = {}
+    for old in stored:
+        if not old:
+            continue
+        old_algorithm = fingerprint_algorithm(old)
+        if old_algorithm == algorithm or old_algorithm not in _ALGORITHMS:
+            continue
+        if old_algorithm not in computed:
+            computed[old_algorithm] = hash_file(file_path, algorithm=old_algorithm).fingerprint
+        if same_fingerprint(old, computed[old_algorithm]):
+            migrated[old] = current
+    return migrated
+
+
+def _decode(data: bytes) -> str:
+    # 与文本模式 open 读取的结果一致，换行统一为 \n
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def hash_files(
+    paths: Iterable[str],
+    with_content: bool = False,
+    workers: int = HASH_WORKERS,
+    hasher: Optional[Callable[[str, bool], FileDigest]] = None,
+) -> Dict[str, FileDigest]:
+    """在线程池中并发计算多个文件的指纹
+
+    Args:
+        paths (Iterable[str]): 文件路径
+        with_content (bool, optional): 是否同时返回文件内容
+        workers (int, optional): 线程数
+        hasher (Optional[Callable[[str, bool], FileDigest]], optional): 计算单个文件的函数，默认为 `hash_file`，
+            传入 `StatCache.digest` 时 stat 未变化的文件不再读取
+
+    Returns:
+        Dict[str, FileDigest]: 文件路径 => 指纹和内容
+    """
+    hasher = hasher or hash_file
+    paths = list(paths)
+    if workers <= 1 or len(paths) <= 1:
+        return {path: hasher(path, with_content) for path in paths}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mbs-hash") as executor:
+        digests = executor.map(lambda path: hasher(path, with_content), paths)
+        return dict(zip(paths, digests))
+
+
+def scan_markdown_files(folder_path: str) -> Dict[str, List[str]]:
+    """用 `os.scandir` 列出各分类文件夹中的 markdown 文件
+
+    Args:
+        folder_path (str): 文章根目录，子文件夹名为分类名
+
+    Returns:
+        Dict[str, List[str]]: 分类名 => 文件路径列表
+    """
+    result: Dict[str, List[str]] = {}
+    with os.scandir(folder_path) as folders:
+        for folder in folders:
+            if folder.name.startswith(".") or not folder.is_dir():
+                continue
+            with os.scandir(folder.path) as entries:
+                result[folder.name] = [
+                    entry.path
+                    for entry in entries
+                    if entry.name.endswith(".md") and not entry.name.startswith(".") and entry.is_file()
+                ]
+    return result
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: httpcache.py
+# @Created: 2026-10-18 13:05:12
+# @Modified: 2026-10-18 13:05:12
+
+"""平台列表接口的响应缓存
+
+分类列表、文集中的文章列表、文章的版本列表每次都会完整下载，但很少变化。
+响应按 平台/账号/URL 保存在配置文件夹的 `cache` 目录中，每个 URL 一个 JSON 文件：
+
+- 平台返回了 ETag 或 Last-Modified 时，下次请求带上 If-None-Match / If-Modified-Since，
+  收到 304 时使用缓存的内容；
+- 平台没有返回这两个响应头时，缓存在 `HTTP_CACHE_TTLS` 指定的秒数内直接使用，不发请求；
+- mbs 自己修改了某个资源（如新建分类、更新文章）后，立即删除对应的缓存。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from typing import Any, Awaitable, Callable, Dict, Mapping, NamedTuple, Optional
+
+from mbs.utils.settings import HTTP_CACHE_ENABLED, HTTP_CACHE_FOLDER
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+# 附加的请求头 => 响应，响应需要有 status_code、headers、json() 和 text
+Send = Callable[[Dict[str, str]], Any]
+AsyncSend = Callable[[Dict[str, str]], Awaitable[Any]]
+
+
+def account_id(*credentials: Any) -> str:
+    """用登录凭据生成账号标识，不同账号的缓存互不影响，缓存文件中不保存凭据本身"""
+    data = json.dumps(credentials, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class CacheEntry(NamedTuple):
+    """缓存的响应"""
+
+    url: str
+    data: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+    def validators(self) -> Dict[str, str]:
+        """条件请求的请求头，平台没有返回 ETag 和 Last-Modified 时为空"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class CachedResponse(NamedTuple):
+    """`fetch` 的结果"""
+
+    status_code: int
+    # 状态码为 200 时是解析后的 JSON，否则是响应文本
+    data: Any
+    from_cache: bool = False
+
+
+class ResponseCache:
+    """按平台、账号和 URL 缓存 JSON 响应，可以在多个线程中使用"""
+
+    def __init__(self, folder: str = HTTP_CACHE_FOLDER, enabled: bool = HTTP_CACHE_ENABLED):
+        self.folder = folder
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _path(self, platform: str, account: str, url: str) -> str:
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.folder, platform, account, name + ".json")
+
+    def get(self, platform: str, account: str, url: str) -> Optional[CacheEntry]:
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(platform, account, url), "r", encoding="utf-8") as f:
+                return CacheEntry(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            logger.warning(f"缓存文件已损坏，忽略：{url}，{e!r}")
+            return None
+
+    def put(self, platform: str, account: str, url: str, data: Any, headers: Optional[Mapping[str, str]] = None):
+        """保存响应
+
+        Args:
+            platform (str): 平台的 key
+            account (str): 账号标识，见 `account_id`
+            url (str): 资源的 URL
+            data (Any): 可以序列化为 JSON 的响应内容
+            headers (Optional[Mapping[str, str]], optional): 响应头，用于取出 ETag 和 Last-Modified
+        """
+        if not self.enabled:
+            return
+        headers = headers or {}
+        entry = CacheEntry(url, data, headers.get("ETag"), headers.get("Last-Modified"), time.time())
+        path = self._path(platform, account, url)
+        os.makedirs(os.path.dirname(path), 0o700, exist_ok=True)
+        # 先写临时文件再替换，其他线程或进程不会读到写了一半的文件
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry._asdict(), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def invalidate(self, platform: str, account: str, url: Optional[str] = None):
+        """删除缓存
+
+        Args:
+            platform (str): 平台的 key
+            account (str): 账号标识
+            url (Optional[str], optional): 资源的 URL，为 None 时删除此账号在该平台的所有缓存
+        """
+        if url is not None:
+            paths = [self._path(platform, account, url)]
+        else:
+            folder = os.path.join(self.folder, platform, account)
+            paths = [os.path.join(folder, name) for name in os.listdir(folder)] if os.path.isdir(folder) else []
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        logger.debug(f"已删除 {platform} 的缓存：{url or '全部'}")
+
+    def _fresh(self, entry: CacheEntry, ttl: float) -> bool:
+        # 有验证器的缓存每次都用条件请求确认，没有验证器的只在有效期内使用
+        return not entry.validators() and time.time() - entry.stored_at < ttl
+
+    def _before(self, platform: str, account: str, url: str, ttl: float):
+        entry = self.get(platform, account, url)
+        if entry is not None and self._fresh(entry, ttl):
+            with self._lock:
+                self.hits += 1
+            return entry, CachedResponse(200, entry.data, True)
+        return entry, None
+
+    def _after(self, platform: str, account: str, url: str, entry: Optional[CacheEntry], resp) -> CachedResponse:
+        if resp.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            logger.debug(f"资源未变化，使用缓存：{url}")
+            return CachedResponse(200, entry.data, True)
+        with self._lock:
+            self.misses += 1
+        if resp.status_code != 200:
+            return CachedResponse(resp.status_code, resp.text)
+        data = resp.json()
+        self.put(platform, account, url, data, resp.headers)
+        return CachedResponse(200, data)
+
+    def fetch(self, platform: str, account: str, url: str, ttl: float, send: Send) -> CachedResponse:
+        """获取 GET 接口的 JSON 内容，能用缓存时使用缓存
+
+        Args:
+            platform (str): 平台的 key
+            account (str): 账号标识
+            url (str): 资源的 URL
+            ttl (float): 平台没有返回 ETag 和 Last-Modified 时缓存的有效秒数
+            send (Send): 发送请求的函数，参数为需要附加的条件请求头
+
+        Returns:
+            CachedResponse: 状态码和内容
+        """
+        entry, cached = self._before(platform, account, url, ttl)
+        if cached is not None:
+            return cached
+        return self._after(platform, account, url, entry, send(entry.validators() if entry else {}))
+
+    async def afetch(self, platform: str, account: str, url: str, ttl: float, send: AsyncSend) -> CachedResponse:
+        """`fetch` 的异步版本"""
+        entry, cached = self._before(platform, account, url, ttl)
+        if cached is not None:
+            return cached
+        return self._after(platform, account, url, entry, await send(entry.validators() if entry else {}))
+
+    def memoize(self, platform: str, account: str, url: str, ttl: float, load: Callable[[], Any]) -> Any:
+        """缓存不走 HTTP GET 的调用结果（如博客园的 xml-rpc），只按有效期判断
+
+        Args:
+            platform (str): 平台的 key
+            account (str): 账号标识
+            url (str): 用作缓存键的 URL 或方法名
+            ttl (float): 有效秒数
+            load (Callable[[], Any]): 获取最新结果的函数，返回 None 表示失败，不缓存
+
+        Returns:
+            Any: 结果
+        """
+        entry, cached = self._before(platform, account, url, ttl)
+        if cached is not None:
+            return cached.data
+        with self._lock:
+            self.misses += 1
+        data = load()
+        if data is not None:
+            self.put(platform, account, url, data)
+        return data
+
+    def report(self):
+        """在日志中输出缓存的使用情况"""
+        if self.hits or self.revalidated or self.misses:
+            logger.info(f"响应缓存：命中 {self.hits} 次，304 {self.revalidated} 次，重新下载 {self.misses} 次")
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局共享的响应缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: images.py
+# @Created: 2026-10-18 13:40:08
+# @Modified: 2026-10-18 03:32:32
+
+import os
+import re
+import asyncio
+
+from typing import Dict, List, Mapping, Optional
+
+from mbs.utils.filecache import StatCache
+from mbs.utils.hashing import fingerprint_bytes
+from mbs.utils.retry import request_with_retry
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+# markdown 中的图片 ![说明](链接)，第 1 组是链接
+IMAGE_PATTERN = re.compile(r"!\[.+?\]\((.+?)\)")
+
+
+def find_images(content: str) -> List[str]:
+    """按出现顺序列出文章中的所有图片链接，不重复"""
+    return list(dict.fromkeys(IMAGE_PATTERN.findall(content)))
+
+
+def replace_images(content: str, urls: Mapping[str, str]) -> str:
+    """一次遍历替换文章中的图片链接
+
+    只替换图片语法中的链接，其他 URL 中包含的相同子串不受影响。
+
+    Args:
+        content (str): 文章内容
+        urls (Mapping[str, str]): 原链接 => 新链接，不在其中的图片保留原链接
+
+    Returns:
+        str: 替换后的文章内容
+    """
+    if not urls:
+        return content
+
+    def repl(match: "re.Match") -> str:
+        new = urls.get(match.group(1))
+        if new is None:
+            return match.group(0)
+        # 链接后面只剩右括号
+        return match.group(0)[: match.start(1) - match.start()] + new + ")"
+
+    return IMAGE_PATTERN.sub(repl, content)
+
+
+def is_remote(source: str) -> bool:
+    return source.startswith("http")
+
+
+class ImageStore:
+    """按图片内容寻址的图床链接
+
+    同一张图片不论以相对路径、绝对路径还是不同的 CDN 链接引用，内容指纹都相同，
+    每个平台的图床中只需要上传一次。
+
+    本地图片的指纹使用 stat 缓存，文件没变时不重新读取；远程图片只在第一次遇到该链接时下载一次。
+    """
+
+    def __init__(self, db, sources: List[str]):
+        """初始化函数
+
+        Args:
+            db (TYPE): 数据库
+            sources (List[str]): 文章中的所有图片链接，用于一次读出本地图片的 stat 缓存
+        """
+        self.db = db
+        paths = [os.path.abspath(i) for i in sources if not is_remote(i)]
+        self._stats = StatCache(db.select_file_stats(paths))
+
+    async def digest(self, source: str) -> Optional[str]:
+        """计算图片内容的指纹
+
+        Args:
+            source (str): 本地路径或远程链接
+
+        Returns:
+            Optional[str]: 指纹，文件不存在或下载失败时为 None
+        """
+        if not is_remote(source):
+            path = os.path.abspath(source)
+            if not os.path.isfile(path):
+                return None
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._stats.fingerprint, path)
+
+        digest = self.db.select_image_digest(source)
+        if digest:
+            return digest
+        try:
+            resp = await request_with_retry("images", "GET", source)
+        except Exception as e:
+            logger.warning(f"下载远程图片失败，按链接判断是否上传过：{source}，{e!r}")
+            return None
+        if resp.status_code != 200:
+            logger.warning(f"下载远程图片失败，按链接判断是否上传过：{source}，状态码：{resp.status_code}")
+            return None
+        digest = fingerprint_bytes(resp.content)
+        self.db.save_image_digest(source, digest)
+        return digest
+
+    async def digests(self, sources: List[str]) -> Dict[str, Optional[str]]:
+        """并发计算多张图片的指纹"""
+        result = await asyncio.gather(*(self.digest(i) for i in sources))
+        return dict(zip(sources, result))
+
+    def hosted_url(self, platform: str, digest: Optional[str]) -> Optional[str]:
+        """查询内容相同的图片在平台图床中的链接"""
+        if not digest:
+            return None
+        return self.db.select_image_url(digest, platform)
+
+    def save(self, platform: str, digest: Optional[str], url: str):
+        if digest:
+            self.db.save_image_url(digest, platform, url)
+
+    def close(self):
+        """将新计算的本地图片指纹写回数据库"""
+        self._stats.save(self.db)
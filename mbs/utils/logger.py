@@ -4,15 +4,87 @@
 # @Email: thepoy@163.com
 # @File Name: logger.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-06-19 22:16:30
+# @Modified: 2026-10-18 03:52:51
 
-from colorful_logger import get_logger
-from colorful_logger import child_logger as cl
+import threading
 
-from mbs.utils.settings import LOG_FILE_PATH
+from contextlib import contextmanager
+from typing import Iterator, Optional, TextIO
 
-logger = get_logger(name="mbs", file_path=LOG_FILE_PATH)
+from mbs.utils.settings import LOG_FILE_PATH, ensure_config_folder
+
+_lock = threading.Lock()
+_root = None
+
+
+def _root_logger():
+    global _root
+    with _lock:
+        if _root is None:
+            from colorful_logger import get_logger
+
+            ensure_config_folder()
+            _root = get_logger(name="mbs", file_path=LOG_FILE_PATH)
+    return _root
+
+
+class _LazyLogger:
+    """第一次使用时才导入 colorful_logger 并打开日志文件的 logger
+
+    `mbs -v` 这类不输出日志的命令不会创建配置文件夹和日志文件。
+    """
+
+    def __init__(self, name: Optional[str] = None):
+        self._name = name
+        self._logger = None
+
+    def _get(self):
+        if self._logger is None:
+            root = _root_logger()
+            if self._name is None:
+                self._logger = root
+            else:
+                from colorful_logger import child_logger as cl
+
+                self._logger = cl(self._name, root)
+        return self._logger
+
+    def __getattr__(self, name: str):
+        return getattr(self._get(), name)
+
+    def __enter__(self):
+        return self._get().__enter__()
+
+    def __exit__(self, *args):
+        return self._get().__exit__(*args)
+
+
+logger = _LazyLogger()
 
 
 def child_logger(name: str):
-    return cl(name, logger)
+    return _LazyLogger(name)
+
+
+@contextmanager
+def capture(stream: TextIO) -> Iterator[None]:
+    """在此期间把所有日志同时写入 stream
+
+    colorful_logger 的终端 handler 创建时就绑定了 sys.stderr，`redirect_stderr` 截获不到日志，
+    后台服务用此函数把每条命令的日志返回给客户端。
+
+    Args:
+        stream (TextIO): 日志的写入位置
+    """
+    from colorful_logger.consts import TIME_FORMAT_WITHOUT_DATE
+    from colorful_logger.handlers import console_handler
+
+    root = _root_logger()
+    handler = console_handler(TIME_FORMAT_WITHOUT_DATE)
+    handler.setStream(stream)
+    # 子 logger 与根 logger 共用同一个 handler 列表
+    root.addHandler(handler)
+    try:
+        yield
+    finally:
+        root.removeHandler(handler)
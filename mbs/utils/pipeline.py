@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: pipeline.py
+# @Created: 2026-10-18 03:05:54
+# @Modified: 2026-10-18 03:05:54
+
+import asyncio
+import functools
+
+from typing import Any, Callable, Iterable, List, Optional
+
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+# 通知下游 worker 退出的哨兵
+_DONE = object()
+
+
+class Stage:
+    """流水线中的一个阶段"""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1):
+        """初始化函数
+
+        Args:
+            name (str): 阶段名，用于日志
+            func (Callable[[Any], Any]): 处理函数，可以是协程函数，也可以是普通函数（在线程池中执行）。
+                返回 None 表示该条目到此为止，不再进入后续阶段
+            workers (int, optional): 此阶段同时处理的条目数
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+    async def process(self, item: Any) -> Any:
+        if asyncio.iscoroutinefunction(self.func):
+            return await self.func(item)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.func, item))
+
+
+class Pipeline:
+    """由有界队列连接的多阶段流水线
+
+    每个阶段有自己的 worker 数，阶段之间的队列有容量上限，下游处理不过来时上游会等待，
+    同时在处理中的条目数不会超过队列容量与 worker 数之和，内存占用不随条目总数增长。
+    """
+
+    def __init__(self, queue_size: int = 8):
+        """初始化函数
+
+        Args:
+            queue_size (int, optional): 阶段之间的队列容量
+        """
+        self.queue_size = queue_size
+        self.stages: List[Stage] = []
+
+    def add_stage(self, name: str, func: Callable[[Any], Any], workers: int = 1) -> "Pipeline":
+        self.stages.append(Stage(name, func, workers))
+        return self
+
+    async def _worker(self, stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+
+            try:
+                result = await stage.process(item)
+            except Exception as e:
+                # 单个条目出错不影响其他条目
+                logger.error(f"流水线阶段 [ {stage.name} ] 处理失败：{e!r}")
+                continue
+
+            if result is not None and outbox is not None:
+                await outbox.put(result)
+
+    async def _run_stage(self, stage: Stage, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]):
+        workers = [asyncio.create_task(self._worker(stage, inbox, outbox)) for _ in range(stage.workers)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+
+        # 本阶段全部结束后通知下一阶段的所有 worker
+        if outbox is not None:
+            for _ in range(self._next_workers(stage)):
+                await outbox.put(_DONE)
+
+    def _next_workers(self, stage: Stage) -> int:
+        index = self.stages.index(stage)
+        return self.stages[index + 1].workers
+
+    async def run(self, items: Iterable[Any]):
+        """将所有条目送入流水线，直到全部处理完
+
+        Args:
+            items (Iterable[Any]): 条目，会按需逐个取出，可以是生成器
+        """
+        if not self.stages:
+            return
+
+        queues = [asyncio.Queue(self.queue_size) for _ in self.stages]
+        runners = [
+            asyncio.create_task(self._run_stage(stage, queues[i], queues[i + 1] if i + 1 < len(self.stages) else None))
+            for i, stage in enumerate(self.stages)
+        ]
+
+        try:
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_DONE)
+
+            await asyncio.gather(*runners)
+        finally:
+            for r in runners:
+                r.cancel()
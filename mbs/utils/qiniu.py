@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: qiniu.py
+# @Created: 2026-10-18 14:31:50
+# @Modified: 2026-10-18 03:53:36
+
+"""上传本地图片到七牛云
+
+简书的本地图片需要先向简书请求上传凭证（token）和文件名（key），再把文件 POST 到七牛。
+"""
+
+import io
+import os
+import json
+import time
+import uuid
+import base64
+
+from typing import IO, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from requests import Response
+
+from mbs.utils.logger import child_logger
+from mbs.utils.retry import call_with_retry
+from mbs.utils.session import get_session_pool
+from mbs.utils.singleflight import SingleFlight
+
+logger = child_logger(__name__)
+
+UPLOAD_URL = "https://upload.qiniup.com/"
+# 距离过期不足此秒数的 token 不再使用
+TOKEN_EXPIRY_MARGIN = 60
+# 上传时每次从文件中读取的字节数
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def upload_filename(path: str) -> str:
+    return os.path.basename(path).replace(" ", "_")
+
+
+def token_deadline(token: str) -> Optional[float]:
+    """从上传凭证中取出过期时间戳
+
+    凭证的格式为 `AccessKey:签名:base64(putPolicy)`，putPolicy 中的 deadline 是过期时间。
+
+    Returns:
+        Optional[float]: 过期时间戳，无法解析时为 None
+    """
+    try:
+        policy = token.split(":")[2]
+        return float(json.loads(base64.urlsafe_b64decode(policy + "=" * (-len(policy) % 4)))["deadline"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class MultipartBody:
+    """边读边发的 multipart/form-data 请求体
+
+    requests 把有 `__iter__` 和 `__len__` 的对象当作流发送并设置 Content-Length，
+    每次只读取一块，文件不会整个读入内存。
+    """
+
+    def __init__(self, fields: Dict[str, str], filename: str, file: IO[bytes]):
+        """初始化函数
+
+        Args:
+            fields (Dict[str, str]): 普通表单字段
+            filename (str): 上传的文件名
+            file (IO[bytes]): 以二进制模式打开的文件，位于文件开头
+        """
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+
+        head = b"".join(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+            for name, value in fields.items()
+        )
+        filename = filename.replace('"', "%22")
+        head += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode("utf-8")
+        tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+        self._parts: List[IO[bytes]] = [io.BytesIO(head), file, io.BytesIO(tail)]
+        self._length = len(head) + os.fstat(file.fileno()).st_size + len(tail)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and size != 0:
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0)
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+
+class UploadTokens:
+    """本地图片的上传凭证
+
+    每张图片的凭证和 key 都要单独请求，`prefetch` 在等待上传名额时就在后台请求凭证，
+    上传时凭证通常已经就绪，请求凭证与上传文件交错进行。每个 key 只能上传一次，凭证取出或丢弃后不再保留。
+    """
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Tuple[str, str]]]):
+        """初始化函数
+
+        Args:
+            fetch (Callable[[str], Awaitable[Tuple[str, str]]]): 用上传的文件名请求 (token, key) 的函数
+        """
+        self._fetch = fetch
+        self._loading = SingleFlight()
+        # 图片路径 => (token, key)
+        self._tokens: Dict[str, Tuple[str, str]] = {}
+        # 预取后还没有取出或丢弃的图片，请求返回前被丢弃的凭证不再保存
+        self._wanted: Set[str] = set()
+
+    async def _load(self, path: str):
+        try:
+            token_and_key = await self._fetch(upload_filename(path))
+            if path in self._wanted:
+                self._tokens[path] = token_and_key
+        except Exception as e:
+            # 上传时会重新请求
+            logger.warning(f"预取 {path} 的上传凭证失败：{e!r}")
+
+    def prefetch(self, paths: Iterable[str]):
+        """在后台请求多张图片的上传凭证，不等待结果"""
+        for path in paths:
+            if path not in self._tokens:
+                self._wanted.add(path)
+                self._loading.run(path, lambda p=path: self._load(p))
+
+    def discard(self, path: str):
+        """丢弃没有取出的凭证，包括还在请求中的"""
+        self._wanted.discard(path)
+        self._tokens.pop(path, None)
+
+    async def take(self, path: str) -> Tuple[str, str]:
+        """取出图片的上传凭证和 key，没有预取、预取失败或快要过期时重新请求"""
+        if path not in self._tokens:
+            self._wanted.add(path)
+            await self._loading.run(path, lambda: self._load(path))
+        self._wanted.discard(path)
+        token_and_key = self._tokens.pop(path, None)
+        if token_and_key is not None:
+            deadline = token_deadline(token_and_key[0])
+            if deadline is None or deadline - TOKEN_EXPIRY_MARGIN > time.time():
+                return token_and_key
+            logger.debug(f"{path} 的上传凭证即将过期，重新请求")
+        return await self._fetch(upload_filename(path))
+
+
+async def upload(path: str, token: str, key: str) -> Response:
+    """上传本地文件
+
+    每次尝试都重新打开文件并在结束后关闭，重试时不会发送已读完的文件。
+    文件边读边发，不把整个请求体读入内存。
+
+    Args:
+        path (str): 文件路径
+        token (str): 上传凭证
+        key (str): 七牛中的文件名
+
+    Returns:
+        Response: 七牛的响应
+    """
+    fields = {"token": token, "key": key, "x:protocol": "https"}
+
+    async def send() -> Response:
+        with open(path, "rb") as f:
+            body = MultipartBody(fields, upload_filename(path), f)
+            return await get_session_pool().arequest(
+                "POST", UPLOAD_URL, data=body, headers={"Content-Type": body.content_type}
+            )
+
+    # 上传不是幂等的，只在请求一定没有发出时重试
+    return await call_with_retry("qiniu", send, idempotent=False)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: ratelimit.py
+# @Created: 2026-10-18 03:01:17
+# @Modified: 2026-10-18 03:44:07
+
+import json
+import time
+import asyncio
+
+from typing import Dict, Optional, Tuple
+
+from mbs.utils.aio import LoopLocal
+from mbs.utils.settings import CONFIG_FILE_PATH, RATE_LIMITS
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+DEFAULT_ENDPOINT = "default"
+
+
+class TokenBucket:
+    """令牌桶
+
+    以 `rate` 个/秒的速度补充令牌，最多攒 `burst` 个，两次请求之间至少间隔 `min_interval` 秒。
+    """
+
+    def __init__(self, rate: float, burst: int = 1, min_interval: float = 0):
+        """初始化函数
+
+        Args:
+            rate (float): 每秒补充的令牌数
+            burst (int, optional): 令牌桶容量，即允许的突发请求数
+            min_interval (float, optional): 两次请求之间的最小间隔（秒）
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be greater than 0 and burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.min_interval = min_interval
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._last_acquired: Optional[float] = None
+
+        self._lock = LoopLocal(asyncio.Lock)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _delay(self, now: float) -> float:
+        """距离下一次可以发出请求还需要等待的秒数"""
+        self._refill(now)
+        delay = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        if self._last_acquired is not None:
+            delay = max(delay, self._last_acquired + self.min_interval - now)
+        return delay
+
+    async def acquire(self):
+        """取一个令牌，没有令牌时等待"""
+        async with self._lock.get():
+            while True:
+                delay = self._delay(time.monotonic())
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+
+            self._tokens -= 1
+            self._last_acquired = time.monotonic()
+
+
+class RateLimiter:
+    """各平台共享的限速调度器
+
+    每个平台有一个 `default` 令牌桶，限制该平台的全部请求；
+    某些接口（如简书更新文章、思否创建文章）另有单独的令牌桶。
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Tuple[float, int, float]]]):
+        """初始化函数
+
+        Args:
+            limits (Dict[str, Dict[str, Tuple[float, int, float]]]): 平台 => 接口 => (每秒请求数, 突发数, 最小间隔)
+        """
+        self.limits = limits
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def bucket(self, platform: str, endpoint: str = DEFAULT_ENDPOINT) -> Optional[TokenBucket]:
+        key = (platform, endpoint)
+        if key not in self._buckets:
+            limit = self.limits.get(platform, {}).get(endpoint)
+            if not limit:
+                return None
+            self._buckets[key] = TokenBucket(*limit)
+        return self._buckets[key]
+
+    async def acquire(self, platform: str, endpoint: str = DEFAULT_ENDPOINT):
+        """等待直到可以向平台的某个接口发出请求
+
+        Args:
+            platform (str): 平台的 key，如 `jianshu`
+            endpoint (str, optional): 接口名，不传时只受平台整体速率限制
+        """
+        start = time.monotonic()
+
+        if endpoint != DEFAULT_ENDPOINT:
+            bucket = self.bucket(platform, endpoint)
+            if bucket:
+                await bucket.acquire()
+
+        bucket = self.bucket(platform)
+        if bucket:
+            await bucket.acquire()
+
+        waited = time.monotonic() - start
+        if waited > 0.5:
+            logger.debug(f"{platform} 的 {endpoint} 接口限速，已等待 {waited:.2f} 秒")
+
+
+def _read_rate_limits() -> Dict[str, Dict[str, Tuple[float, int, float]]]:
+    """默认限速配置，可用配置文件中的 `rate_limits` 覆盖"""
+    limits = {platform: dict(endpoints) for platform, endpoints in RATE_LIMITS.items()}
+    try:
+        with open(CONFIG_FILE_PATH, "r", encoding="utf-8") as f:
+            content = f.read()
+        custom = json.loads(content).get("rate_limits", {}) if content else {}
+    except (FileNotFoundError, ValueError):
+        custom = {}
+
+    for platform, endpoints in custom.items():
+        for endpoint, limit in endpoints.items():
+            limits.setdefault(platform, {})[endpoint] = tuple(limit)
+    return limits
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取全局共享的限速调度器"""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(_read_rate_limits())
+    return _limiter
@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: retry.py
+# @Created: 2026-10-18 03:03:57
+# @Modified: 2026-10-18 03:50:32
+
+import time
+import random
+import socket
+import asyncio
+import threading
+import xmlrpc.client as xml
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import requests
+
+from requests import Response
+from urllib3.exceptions import NewConnectionError
+
+from mbs.utils.settings import (
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+)
+from mbs.utils.exceptions import CircuitOpenError
+from mbs.utils.ratelimit import get_rate_limiter
+from mbs.utils.session import get_session_pool
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+# 错误分类：请求一定没有到达平台，可以安全重试
+NOT_SENT = "not_sent"
+# 错误分类：请求可能已被平台处理，只有幂等请求可以重试
+MAYBE_SENT = "maybe_sent"
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryableStatusError(Exception):
+    """响应状态码表示平台暂时不可用"""
+
+    def __init__(self, response: Response):
+        super().__init__(f"状态码：{response.status_code}")
+        self.response = response
+
+
+class RetryPolicy:
+    """带随机抖动的指数退避重试策略"""
+
+    def __init__(
+        self,
+        max_attempts: int = RETRY_MAX_ATTEMPTS,
+        base_delay: float = RETRY_BASE_DELAY,
+        max_delay: float = RETRY_MAX_DELAY,
+    ):
+        """初始化函数
+
+        Args:
+            max_attempts (int, optional): 最多尝试次数，包括第一次
+            base_delay (float, optional): 第一次重试前的基础等待时间（秒）
+            max_delay (float, optional): 单次等待时间的上限（秒）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """第 attempt 次失败后的等待时间
+
+        使用 full jitter：在 [0, min(max_delay, base_delay * 2^(attempt-1))] 中随机取值，
+        避免多个任务同时重试。平台返回 Retry-After 时以其为下限。
+
+        Args:
+            attempt (int): 已失败的次数，从 1 开始
+            error (Optional[BaseException], optional): 本次失败的异常
+
+        Returns:
+            float: 等待秒数
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if isinstance(error, RetryableStatusError):
+            retry_after = error.response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), self.max_delay))
+        return delay
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败 `failure_threshold` 次后熔断，`reset_timeout` 秒内不再向该平台发送请求；
+    之后放行一个试探请求，成功则恢复，失败则继续熔断。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        platform: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ):
+        self.platform = platform
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """发送请求前检查熔断状态
+
+        Raises:
+            CircuitOpenError: 平台处于熔断状态
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"{self.platform} 连续失败 {self._failures} 次，已熔断，跳过此请求")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f"{self.platform} 正在试探是否恢复，跳过此请求")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.platform} 已恢复")
+            self.state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """调用没有结果（被取消、退出或不是平台故障的错误）时释放试探名额，不改变熔断状态
+
+        半开状态下的下一个请求会重新作为试探请求。
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"{self.platform} 连续失败 {self._failures} 次，{self.reset_timeout} 秒内不再发送请求")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(platform: str) -> CircuitBreaker:
+    """获取平台的熔断器"""
+    with _breakers_lock:
+        if platform not in _breakers:
+            _breakers[platform] = CircuitBreaker(platform)
+        return _breakers[platform]
+
+
+def classify_error(error: BaseException) -> Optional[str]:
+    """判断异常是否为暂时性错误
+
+    Args:
+        error (BaseException): 异常
+
+    Returns:
+        Optional[str]: `NOT_SENT`、`MAYBE_SENT`，不是暂时性错误时返回 None
+    """
+    if isinstance(error, RetryableStatusError):
+        # 429 表示请求被限流，平台没有处理
+        return NOT_SENT if error.response.status_code == 429 else MAYBE_SENT
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return NOT_SENT
+    if isinstance(error, requests.exceptions.ConnectionError):
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return NOT_SENT if isinstance(reason, NewConnectionError) else MAYBE_SENT
+    if isinstance(error, requests.exceptions.Timeout):
+        return MAYBE_SENT
+
+    # xml-rpc
+    if isinstance(error, xml.ProtocolError):
+        if error.errcode == 429:
+            return NOT_SENT
+        return MAYBE_SENT if error.errcode >= 500 else None
+    if isinstance(error, (ConnectionRefusedError, socket.gaierror)):
+        return NOT_SENT
+    if isinstance(error, OSError):
+        return MAYBE_SENT
+
+    return None
+
+
+_default_policy = RetryPolicy()
+
+
+async def call_with_retry(
+    platform: str,
+    func: Callable[[], Awaitable[Any]],
+    idempotent: bool = True,
+    policy: Optional[RetryPolicy] = None,
+) -> Any:
+    """带重试和熔断地执行一次平台调用
+
+    非幂等的调用（如创建文章）只在请求一定没有到达平台时重试，不会重复创建。
+
+    Args:
+        platform (str): 平台的 key
+        func (Callable[[], Awaitable[Any]]): 执行调用的协程函数，每次尝试都会重新调用
+        idempotent (bool, optional): 调用是否幂等
+        policy (Optional[RetryPolicy], optional): 重试策略
+
+    Raises:
+        CircuitOpenError: 平台处于熔断状态
+
+    Returns:
+        Any: func 的返回值
+    """
+    policy = policy or _default_policy
+    breaker = get_circuit_breaker(platform)
+
+    attempt = 1
+    while True:
+        breaker.before_call()
+        try:
+            result = await func()
+        except Exception as e:
+            kind = classify_error(e)
+            if kind is None:
+                # 不是平台故障（如 4xx、程序错误），既不算成功也不算失败
+                breaker.release_trial()
+                raise
+
+            breaker.record_failure()
+            if attempt >= policy.max_attempts or not (idempotent or kind == NOT_SENT):
+                raise
+
+            delay = policy.backoff(attempt, e)
+            logger.warning(f"{platform} 请求失败：{e}，{delay:.2f} 秒后第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        except BaseException:
+            # 被 --deadline、Ctrl+C 取消或进程退出，否则半开状态的试探名额永远不会释放
+            breaker.release_trial()
+            raise
+
+        breaker.record_success()
+        return result
+
+
+async def request_with_retry(
+    platform: str, method: str, url: str, idempotent: Optional[bool] = None, **kwargs
+) -> Response:
+    """通过共享会话池发送请求，遵守平台限速，失败时按策略重试
+
+    Args:
+        platform (str): 平台的 key
+        method (str): 请求方法
+        url (str): 请求链接
+        idempotent (Optional[bool], optional): 请求是否幂等，默认根据请求方法判断
+
+    Returns:
+        Response: 响应，重试次数用完时返回最后一次的响应
+    """
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    async def send() -> Response:
+        await get_rate_limiter().acquire(platform)
+        resp = await get_session_pool().arequest(method, url, **kwargs)
+        if resp.status_code in RETRY_STATUSES:
+            raise RetryableStatusError(resp)
+        return resp
+
+    try:
+        return await call_with_retry(platform, send, idempotent)
+    except RetryableStatusError as e:
+        # 交给调用方按原来的方式处理错误响应
+        return e.response
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: session.py
+# @Created: 2026-10-18 09:12:40
+# @Modified: 2026-10-18 03:05:30
+
+import asyncio
+import functools
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+from mbs.utils.settings import HTTP_POOL_SIZE, HTTP_MAX_WORKERS, CONNECT_TIMEOUT, READ_TIMEOUT
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+
+class SessionPool:
+    """按 host 划分的 keep-alive 会话池
+
+    每个 host 持有一个独立的 `requests.Session`，同一 host 的请求复用已建立的 TCP/TLS 连接，
+    简书、思否、七牛等所有客户端共享同一个会话池。
+
+    协程中使用 `arequest`，请求会在有界线程池中执行，不会阻塞事件循环，
+    多个平台、多张图片的请求可以同时进行。
+    """
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        max_workers: int = HTTP_MAX_WORKERS,
+        timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+    ):
+        """初始化函数
+
+        Args:
+            pool_size (int, optional): 每个 host 最多保持的空闲连接数
+            max_workers (int, optional): 异步请求使用的线程数上限
+            timeout (Tuple[float, float], optional): 默认的 (建立连接超时, 读取超时)，单位秒
+        """
+        self.pool_size = pool_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._sessions: Dict[str, requests.Session] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def session(self, url: str) -> requests.Session:
+        """获取 url 所在 host 的会话，没有时创建
+
+        Args:
+            url (str): 请求链接
+
+        Returns:
+            requests.Session: 该 host 的会话
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if not session:
+                logger.debug(f"为 [ {host} ] 创建连接池，连接数上限 {self.pool_size}")
+                session = self._new_session()
+                self._sessions[host] = session
+            return session
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        # 没有超时的请求遇到挂起的连接会一直阻塞
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session(url).request(method, url, **kwargs)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="mbs-http")
+            return self._executor
+
+    async def arequest(self, method: str, url: str, **kwargs) -> Response:
+        """不阻塞事件循环的请求
+
+        Args:
+            method (str): 请求方法
+            url (str): 请求链接
+
+        Returns:
+            Response: 响应
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self.request, method, url, **kwargs))
+
+    def stats(self) -> Dict[str, Tuple[int, int, int]]:
+        """统计每个 host 的连接复用情况
+
+        Returns:
+            Dict[str, Tuple[int, int, int]]: host => (请求数, 新建连接数, 复用连接数)
+        """
+        result = {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for host, session in sessions:
+            requests_count = connections_count = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools  # type: ignore
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    requests_count += pool.num_requests
+                    connections_count += pool.num_connections
+            result[host] = (requests_count, connections_count, max(requests_count - connections_count, 0))
+        return result
+
+    def report(self):
+        """在日志中输出连接复用情况"""
+        for host, (requests_count, connections_count, reused) in self.stats().items():
+            logger.info(f"[ {host} ] 请求 {requests_count} 次，新建连接 {connections_count} 个，复用连接 {reused} 次")
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_pool: Optional[SessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> SessionPool:
+    """获取全局共享的会话池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SessionPool()
+        return _pool
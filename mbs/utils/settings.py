@@ -4,13 +4,11 @@
 # @Email: thepoy@163.com
 # @File Name: settings.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-06-05 20:46:40
+# @Modified: 2026-10-18 03:52:51
 
 import sys
 import os
 
-from colort import display_style as ds
-
 IS_WINDOWS = sys.platform == "win32"
 
 if IS_WINDOWS:
@@ -18,19 +16,129 @@ if IS_WINDOWS:
 else:
     CONFIG_FOLDER = os.path.join(os.environ["HOME"], ".config", "mbs")
 
-if not os.path.exists(CONFIG_FOLDER):
-    os.mkdir(CONFIG_FOLDER, 0o755)
-
 CONFIG_FILE_PATH = os.path.join(CONFIG_FOLDER, "config.json")
 LOG_FILE_PATH = os.path.join(CONFIG_FOLDER, "mbs.log")
 DATABASE_FILE_PATH = os.path.join(CONFIG_FOLDER, "blogs.db")
+# 后台服务监听的 Unix socket
+SOCKET_PATH = os.path.join(CONFIG_FOLDER, "mbs.sock")
+# 客户端等待后台服务返回命令结果的最长秒数
+DAEMON_TIMEOUT = float(os.environ.get("MBS_DAEMON_TIMEOUT", 30 * 60))
+
+
+def ensure_config_folder() -> str:
+    """创建配置文件夹，在第一次写入日志、数据库或配置文件前调用
+
+    Returns:
+        str: 配置文件夹路径
+    """
+    if not os.path.exists(CONFIG_FOLDER):
+        os.makedirs(CONFIG_FOLDER, 0o755, exist_ok=True)
+    return CONFIG_FOLDER
+
+
+# 各平台的 key，也是配置文件、数据库和限速配置中使用的平台名
+JIANSHU = "jianshu"
+CNBLOGS = "cnblogs"
+SEGMENT_FAULT = "segment_fault"
+
+# 每个 host 保持的 keep-alive 连接数上限
+HTTP_POOL_SIZE = int(os.environ.get("MBS_HTTP_POOL_SIZE", 10))
+# 所有网络连接的建立连接超时和读取超时（秒）
+CONNECT_TIMEOUT = float(os.environ.get("MBS_CONNECT_TIMEOUT", 10))
+READ_TIMEOUT = float(os.environ.get("MBS_READ_TIMEOUT", 60))
+# 异步请求所用线程池的线程数上限
+HTTP_MAX_WORKERS = int(os.environ.get("MBS_HTTP_MAX_WORKERS", 16))
+
+# 分类列表、文章列表等接口的响应缓存，设置环境变量 MBS_HTTP_CACHE=0 时不使用缓存
+HTTP_CACHE_ENABLED = os.environ.get("MBS_HTTP_CACHE", "1") != "0"
+HTTP_CACHE_FOLDER = os.path.join(CONFIG_FOLDER, "cache")
+# 平台不返回 ETag 和 Last-Modified 时各类响应缓存的有效秒数
+HTTP_CACHE_TTLS = {
+    "categories": 60 * 60,
+    # 文章列表和版本列表中有更新文章时需要的版本号，有效期短一些
+    "notes": 5 * 60,
+    "revisions": 5 * 60,
+}
+
+# 各平台的限速：平台 => 接口 => (每秒请求数, 突发数, 最小间隔秒数)，
+# 可在配置文件的 `rate_limits` 中覆盖
+RATE_LIMITS = {
+    JIANSHU: {
+        "default": (2, 4, 0.2),
+        # 简书不能更新太频繁
+        "update": (0.5, 1, 2),
+        "new": (0.5, 1, 2),
+    },
+    SEGMENT_FAULT: {
+        "default": (2, 4, 0.2),
+        # 思否创建文章限制在 1 篇 / 分
+        "new": (1 / 60, 1, 60),
+    },
+    CNBLOGS: {
+        "default": (2, 2, 0),
+    },
+}
+
+# 失败重试：最多尝试次数、基础等待时间和最长等待时间（秒）
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10
 
-STATUS = [
-    ds.format_with_one_style("N", ds.foreground_color.red),
-    ds.format_with_one_style("Y", ds.foreground_color.green),
-    ds.format_with_one_style("U", ds.foreground_color.orange),
-]
+# 熔断：平台连续失败多少次后熔断，熔断多少秒后再试探
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 60
+
+# 文件指纹算法：blake2b、md5，安装了 xxhash 时可以使用 xxh3
+FINGERPRINT_ALGORITHM = os.environ.get("MBS_FINGERPRINT", "blake2b")
+# 计算文件指纹的线程数，hashlib 计算时会释放 GIL
+HASH_WORKERS = int(os.environ.get("MBS_HASH_WORKERS", os.cpu_count() or 4))
+# 超过此字节数的文件只计算指纹时使用 mmap 读取
+HASH_MMAP_THRESHOLD = 8 * 1024 * 1024
+
+# update_all_posts 流水线：阶段之间的队列容量、各阶段的 worker 数
+PIPELINE_QUEUE_SIZE = 8
+PIPELINE_WORKERS = {"hash": HASH_WORKERS, "images": 2, "push": 4}
+# 同时向同一平台推送的文章数上限
+PLATFORM_CONCURRENCY = {JIANSHU: 2, CNBLOGS: 2, SEGMENT_FAULT: 2}
+# 同时上传到图床的本地图片数，也是同时打开的图片文件数
+IMAGE_UPLOAD_CONCURRENCY = int(os.environ.get("MBS_IMAGE_UPLOAD_CONCURRENCY", 4))
+
+# 监听模式：文件最后一次变化后等待的秒数，不支持 inotify 时轮询的间隔秒数
+WATCH_DEBOUNCE = 2.0
+WATCH_POLL_INTERVAL = 5.0
+
+# 分类同步结果的有效秒数，过期前的命令不再请求平台的分类列表
+CATEGORY_SYNC_TTL = float(os.environ.get("MBS_CATEGORY_SYNC_TTL", 24 * 60 * 60))
+# 同步分类时并发请求的线程数
+CATEGORY_SYNC_WORKERS = 4
+
+# 思否标签名 => 标签 id 的本地缓存有效秒数，可以用 MBS_SF_TAG_TTL 修改
+SF_TAG_TTL = float(os.environ.get("MBS_SF_TAG_TTL", 7 * 24 * 60 * 60))
+# 思否中不存在的标签也会缓存，有效期短一些，以便发现之后新建的标签
+SF_TAG_NEGATIVE_TTL = float(os.environ.get("MBS_SF_TAG_NEGATIVE_TTL", 24 * 60 * 60))
+
+# 简书每天最多发布的新文章数
+JIANSHU_DAILY_POST_LIMIT = 2
 
 NO_CODE = 0
 YES_CODE = 1
 UPDATED_CODE = 2
+
+# 文章在各平台的同步状态
+SYNC_OK = "synced"
+SYNC_FAILED = "failed"
+
+
+def __getattr__(name: str):
+    # 只有显示扫描结果时才需要 colort，不在导入时加载
+    if name == "STATUS":
+        from colort import display_style as ds
+
+        global STATUS
+        STATUS = [
+            ds.format_with_one_style("N", ds.foreground_color.red),
+            ds.format_with_one_style("Y", ds.foreground_color.green),
+            ds.format_with_one_style("U", ds.foreground_color.orange),
+        ]
+        return STATUS
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: singleflight.py
+# @Created: 2026-10-18 14:12:37
+# @Modified: 2026-10-18 03:44:07
+
+import asyncio
+
+from typing import Awaitable, Callable, Dict, Hashable
+
+from mbs.utils.aio import LoopLocal
+
+
+class SingleFlight:
+    """合并同时发生的相同调用
+
+    同一个 key 的调用还没结束时，后来的调用方不再重新执行，而是等待同一个任务并得到同一个结果（或异常）。
+    任务结束后立即移除，之后的调用会重新执行，所以调用结果应在任务内保存到数据库等缓存中。
+    """
+
+    def __init__(self):
+        # 任务不能跨事件循环使用，每次 asyncio.run 都重新开始
+        self._tasks: LoopLocal[Dict[Hashable, asyncio.Task]] = LoopLocal(dict)
+
+    def run(self, key: Hashable, func: Callable[[], Awaitable]) -> Awaitable:
+        """执行或加入 key 对应的调用
+
+        Args:
+            key (Hashable): 调用的标识
+            func (Callable[[], Awaitable]): 没有进行中的调用时执行的函数
+
+        Returns:
+            Awaitable: 调用的结果，一个调用方被取消时不影响其他调用方
+        """
+        tasks = self._tasks.get()
+        task = tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            tasks[key] = task
+            task.add_done_callback(lambda _: tasks.pop(key, None))
+        return asyncio.shield(task)
@@ -4,7 +4,10 @@
 # @Email: thepoy@163.com
 # @File Name: meta_weblog.py
 # @Created: 2021-04-07 09:00:26
-# @Modified: 2021-05-23 10:20:20
+# @Modified: 2026-10-18 03:22:29
+
+from datetime import datetime
+from typing import Any, Optional, Union
 
 from mbs.utils.structs import BaseStruct
 
@@ -44,3 +47,82 @@ class Enclosure(BaseStruct):
 
 class Source(BaseStruct):
     fields = ["name", "url"]
+
+
+def remove_none(data: dict):
+    """去除值为 None 的元素
+
+    Args:
+        data (dict): 要去除 None 的字典
+    """
+    for k, v in data.copy().items():
+        if not v:
+            del data[k]
+
+
+def create_post(
+    title: str,
+    description: str,
+    category: str,
+    enclosure: Optional[Enclosure] = None,
+    link: Optional[str] = None,
+    permalink: Optional[str] = None,
+    postid: Optional[Union[str, int]] = None,
+    source: Optional[Source] = None,
+    userid: Optional[str] = None,
+    mt_allow_comments: Optional[Any] = None,
+    mt_allow_pings: Optional[Any] = None,
+    mt_convert_breaks: Optional[Any] = None,
+    mt_text_more: Optional[str] = None,
+    mt_excerpt: Optional[str] = None,
+    mt_keywords: Optional[str] = None,
+    wp_slug: Optional[str] = None,
+) -> Post:
+    """创建 post 结构体/字典
+
+    Args:
+        title (str): 文章标题
+        description (str): 文章内容
+        category (Optional[List[str]], optional): 随笔分类
+        enclosure (Optional[Enclosure], optional): 不知道什么东西
+        link (Optional[str], optional): 不知道什么东西
+        permalink (Optional[str], optional): 不知道什么东西
+        postid (Optional[Union[str, int]], optional): 不知道什么东西
+        source (Optional[Source], optional): 不知道什么东西
+        userid (Optional[str], optional): 不知道什么东西
+        mt_allow_comments (Optional[Any], optional): 不知道什么东西
+        mt_allow_pings (Optional[Any], optional): 不知道什么东西
+        mt_convert_breaks (Optional[Any], optional): 不知道什么东西
+        mt_text_more (Optional[str], optional): 不知道什么东西
+        mt_excerpt (Optional[str], optional): 不知道什么东西
+        mt_keywords (Optional[str], optional): 不知道什么东西
+        wp_slug (Optional[str], optional): 不知道什么东西
+
+    Returns:
+        Post: 文章结构体
+    """
+
+    categories = ["[Markdown]", f"[随笔分类]{category}"]
+    post = {
+        "dateCreated": datetime.now(),
+        "description": description,
+        "title": title,
+        "categories": categories,
+        "enclosure": enclosure,
+        "link": link,
+        "permalink": permalink,
+        "postid": postid,
+        "source": source,
+        "userid": userid,
+        "mt_allow_comments": mt_allow_comments,
+        "mt_allow_pings": mt_allow_pings,
+        "mt_convert_breaks": mt_convert_breaks,
+        "mt_text_more": mt_text_more,
+        "mt_excerpt": mt_excerpt,
+        "mt_keywords": mt_keywords,
+        "wp_slug": wp_slug,
+    }
+
+    remove_none(post)
+
+    return Post(post)
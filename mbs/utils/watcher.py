@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author: thepoy
+# @Email: thepoy@163.com
+# @File Name: watcher.py
+# @Created: 2026-10-18 11:46:27
+# @Modified: 2026-10-18 03:44:16
+
+import os
+import sys
+import errno
+import struct
+import asyncio
+
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from mbs.utils.hashing import scan_markdown_files
+from mbs.utils.settings import WATCH_DEBOUNCE, WATCH_POLL_INTERVAL
+from mbs.utils.logger import child_logger
+
+logger = child_logger(__name__)
+
+# inotify 事件，见 <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _is_post(name: str) -> bool:
+    return name.endswith(".md") and not name.startswith(".")
+
+
+class _Inotify:
+    """用 ctypes 调用 libc 的 inotify 接口，监听文章根目录和所有分类文件夹"""
+
+    def __init__(self, folder: str):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        # 老版本的 libc 没有 inotify_init1，抛出 AttributeError 时使用轮询
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+
+        self.folder = folder
+        # watch descriptor => 目录
+        self._dirs: Dict[int, str] = {}
+        self._watch(folder)
+        for category in scan_markdown_files(folder):
+            self._watch(os.path.join(folder, category))
+
+    def _watch(self, path: str):
+        import ctypes
+
+        wd = self._add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            logger.warning(f"无法监听 {path}：{os.strerror(ctypes.get_errno())}")
+            return
+        self._dirs[wd] = path
+        logger.debug(f"正在监听 {path}")
+
+    def read(self) -> Set[str]:
+        """读出所有待处理的事件，返回发生变化的文章路径"""
+        changed: Set[str] = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+                directory = self._dirs.get(wd)
+                if directory is None:
+                    continue
+                if mask & (IN_IGNORED | IN_DELETE_SELF):
+                    self._dirs.pop(wd, None)
+                    continue
+                path = os.path.join(directory, name)
+                if mask & IN_ISDIR:
+                    # 新建的分类文件夹，其中已有的文章也要处理
+                    if directory == self.folder and not name.startswith("."):
+                        self._watch(path)
+                        try:
+                            names = os.listdir(path)
+                        except OSError as e:
+                            # 读到事件之前文件夹可能已被删除或改名，跳过它，不结束整个监听
+                            logger.warning(f"无法读取新建的分类文件夹 {path}：{e!r}")
+                            continue
+                        changed.update(os.path.join(path, i) for i in names if _is_post(i))
+                elif directory != self.folder and _is_post(name) and mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Polling:
+    """不支持 inotify 时，定时对比所有文章的 stat"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int, int]]:
+        snapshot = {}
+        for paths in scan_markdown_files(self.folder).values():
+            for path in paths:
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (st.st_size, st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def read(self) -> Set[str]:
+        snapshot = self._scan()
+        changed = {path for path, st in snapshot.items() if self._snapshot.get(path) != st}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class FolderWatcher:
+    """监听文章根目录中各分类文件夹里的 markdown 文件
+
+    Linux 中使用 inotify，其他系统或 inotify 不可用时定时轮询。
+    一段时间内的连续保存合并为一批，安静 `debounce` 秒后才交给调用方。
+    """
+
+    def __init__(self, folder: str, debounce: float = WATCH_DEBOUNCE, poll_interval: float = WATCH_POLL_INTERVAL):
+        """初始化函数
+
+        Args:
+            folder (str): 文章根目录，子文件夹名为分类名
+            debounce (float, optional): 最后一次变化后等待的秒数
+            poll_interval (float, optional): 轮询的间隔秒数
+        """
+        self.folder = os.path.abspath(folder)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._backend = None
+
+    def _open(self):
+        if sys.platform.startswith("linux"):
+            try:
+                self._backend = _Inotify(self.folder)
+                logger.info(f"使用 inotify 监听 {self.folder}")
+                return
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify 不可用，改为每 {self.poll_interval} 秒轮询一次：{e!r}")
+        self._backend = _Polling(self.folder)
+        logger.info(f"使用轮询监听 {self.folder}")
+
+    async def _wait(self, loop: asyncio.AbstractEventLoop, timeout: Optional[float]) -> Set[str]:
+        """等待下一批变化，超时返回空集合"""
+        backend = self._backend
+        if isinstance(backend, _Inotify):
+            readable = asyncio.Event()
+            loop.add_reader(backend.fd, readable.set)
+            try:
+                await asyncio.wait_for(readable.wait(), timeout)
+            except asyncio.TimeoutError:
+                return set()
+            finally:
+                loop.remove_reader(backend.fd)
+            return backend.read()
+
+        await asyncio.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        return await loop.run_in_executor(None, backend.read)  # type: ignore
+
+    async def batches(self) -> AsyncIterator[Set[str]]:
+        """持续产出发生变化的文章路径，每批内的路径不重复"""
+        loop = asyncio.get_running_loop()
+        self._open()
+        try:
+            while True:
+                pending = await self._wait(loop, None)
+                if not pending:
+                    continue
+                # 编辑器保存时可能连续触发多次写入，等安静下来再处理
+                while True:
+                    more = await self._wait(loop, self.debounce)
+                    if not more:
+                        break
+                    pending |= more
+                yield pending
+        finally:
+            self._backend.close()  # type: ignore
+            self._backend = None